@@ -7,6 +7,61 @@
 # is not allowed to expose their own king to check (including moving a piece that was blocking a check such that it no
 # longer does). A player is not allowed to put the opponent's king in check.
 
+from array import array
+from enum import Enum
+
+from bitboard import BIT, KING_ATTACKS, KNIGHT_ATTACKS, RANK_8, RAYS, ROOK_DIRECTIONS, SQUARE_INDEX, SQUARE_NAMES, \
+    bishop_attacks, iter_bits, lsb, msb, piece_attacks, rook_attacks
+from zobrist import BLACK_TO_MOVE, NEAR_WIN, PIECE_KEYS, hash_position
+
+
+class Rejection(Enum):
+    """Reasons a move can be refused, each with the message make_move prints by default"""
+    GAME_OVER = 'Invalid Move: Game is Over.'
+    ORIGIN_OFF_BOARD = 'Invalid Move: Origin not on board.'
+    DESTINATION_OFF_BOARD = 'Invalid Move: Destination not on board.'
+    SAME_SQUARE = "Invalid Move: Origin and destination can't be the same"
+    NOT_YOUR_PIECE = "Invalid Move: Can't move other player's piece."
+    KING_CANT_MOVE_THERE = "Invalid Move: King can't move there."
+    ROOK_CANT_MOVE_THERE = "Invalid Move: Rook can't move there."
+    BISHOP_CANT_MOVE_THERE = "Invalid Move: Bishop can't move there."
+    KNIGHT_CANT_MOVE_THERE = "Invalid Move: Knight can't move there."
+    TAKES_KING = 'Invalid Movement: Cannot Take King.'
+    OWN_PIECE = "Invalid Move: Can't move piece onto another of your pieces."
+    KING_IN_CHECK = "Invalid Move: King can't be in check."
+    NOTHING_TO_UNDO = 'Invalid Undo: No moves to undo.'
+
+
+def print_rejection(reason):
+    """Default rejection hook, which prints the rejection's message"""
+    print(reason.value)
+
+
+_CANT_MOVE_THERE = {'K': Rejection.KING_CANT_MOVE_THERE, 'R': Rejection.ROOK_CANT_MOVE_THERE,
+                    'B': Rejection.BISHOP_CANT_MOVE_THERE, 'N': Rejection.KNIGHT_CANT_MOVE_THERE}
+_CANT_MOVE_THERE.update({piece.lower(): reason for piece, reason in list(_CANT_MOVE_THERE.items())})
+
+# Small integer codes for packing pieces and game states into move stack records
+_PIECE_CODES = ' KRBNkrbn'
+_PIECE_CODE = {piece: code for code, piece in enumerate(_PIECE_CODES)}
+_STATES = ('UNFINISHED', 'TIE', 'BLACK WINS', 'WHITE WINS')
+_STATE_CODE = {state: code for code, state in enumerate(_STATES)}
+# Most of each piece a side starts with, and so can ever have
+_PIECE_COUNTS = {'K': 1, 'R': 1, 'B': 2, 'N': 2, 'k': 1, 'r': 1, 'b': 2, 'n': 2}
+
+# The starting position, row 8 first
+_START_ROWS = (
+    '        ',
+    '        ',
+    '        ',
+    '        ',
+    '        ',
+    '        ',
+    'RBN  nbr',
+    'KBN  nbk',
+)
+
+
 class ChessVar:
     """Class that initiates a chess game and begins by setting a board and variables for tracking important
      information"""
@@ -17,39 +72,170 @@ class ChessVar:
     filestoCols = {'a': 0, 'b': 1, 'c': 2, 'd': 3,
                    'e': 4, 'f': 5, 'g': 6, 'h': 7}
     colstoFiles = {v: k for k, v in filestoCols.items()}
-    wKingLoc = 'a1'
-    bKingLoc = 'h1'
-    lastTo = ['a1']
+    # Every piece of game state lives in these per-instance slots (no __dict__), so many games can share a process
+    # without sharing anything mutable and each one stays small
+    __slots__ = ('_pieces', '_colors', '_mailbox', '_attack_from', '_attacks', '_game_state', '_near_win', '_turn',
+                 '_hash', '_history', '_on_reject')
 
     def __init__(self):
-        self._board = [
-            [' ', ' ', ' ', ' ', ' ', ' ', ' ', ' '],
-            [' ', ' ', ' ', ' ', ' ', ' ', ' ', ' '],
-            [' ', ' ', ' ', ' ', ' ', ' ', ' ', ' '],
-            [' ', ' ', ' ', ' ', ' ', ' ', ' ', ' '],
-            [' ', ' ', ' ', ' ', ' ', ' ', ' ', ' '],
-            [' ', ' ', ' ', ' ', ' ', ' ', ' ', ' '],
-            ['R', 'B', 'N', ' ', ' ', 'n', 'b', 'r'],
-            ['K', 'B', 'N', ' ', ' ', 'n', 'b', 'k']
-        ]
-        self._squares = (
-            'a1', 'a2', 'a3', 'a4', 'a5', 'a6', 'a7', 'a8',
-            'b1', 'b2', 'b3', 'b4', 'b5', 'b6', 'b7', 'b8',
-            'c1', 'c2', 'c3', 'c4', 'c5', 'c6', 'c7', 'c8',
-            'd1', 'd2', 'd3', 'd4', 'd5', 'd6', 'd7', 'd8',
-            'e1', 'e2', 'e3', 'e4', 'e5', 'e6', 'e7', 'e8',
-            'f1', 'f2', 'f3', 'f4', 'f5', 'f6', 'f7', 'f8',
-            'g1', 'g2', 'g3', 'g4', 'g5', 'g6', 'g7', 'g8',
-            'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'h7', 'h8'
-        )
+        # Every game starts from the same position, so copy the one set up when the module loaded instead of
+        # rebuilding its attack maps and hash
+        start = _START
+        self._pieces = dict(start._pieces)
+        self._colors = dict(start._colors)
+        self._mailbox = list(start._mailbox)
+        self._attack_from = array('Q', start._attack_from)
+        self._attacks = dict(start._attacks)
         self._game_state = 'UNFINISHED'
         self._near_win = False
         self._turn = 'white'
+        self._hash = start._hash
+        self._history = array('I')
+        self._on_reject = print_rejection
+
+    @classmethod
+    def from_mailbox(cls, mailbox, turn='white', near_win=False, game_state='UNFINISHED'):
+        """Returns a game set up from a 64 square mailbox (piece letters indexed a1 = 0 ... h8 = 63, ' ' for an
+        empty square), whose turn it is, whether white has already reached row 8 and the game state"""
+        mailbox = list(mailbox)
+        if len(mailbox) != 64 or any(piece not in _PIECE_CODE for piece in mailbox):
+            raise ValueError('mailbox must hold 64 entries from ' + repr(_PIECE_CODES))
+        if mailbox.count('K') != 1 or mailbox.count('k') != 1:
+            raise ValueError('mailbox must hold exactly one king of each color')
+        if turn not in ('white', 'black') or game_state not in _STATE_CODE:
+            raise ValueError('unknown turn or game state')
+        game = cls.__new__(cls)
+        game._setup(mailbox, turn, bool(near_win), game_state)
+        return game
+
+    @classmethod
+    def from_position(cls, position):
+        """Returns a game set up from a position string as written by to_position. Raises ValueError if the
+        string is malformed or describes a position that cannot come up in this variant."""
+        fields = position.split()
+        if len(fields) != 3 or fields[1] not in ('w', 'b') or fields[2] not in ('-', '+'):
+            raise ValueError('position must be "<board> <w|b> <-|+>": ' + repr(position))
+        ranks = fields[0].split('/')
+        if len(ranks) != 8:
+            raise ValueError('board must have 8 ranks separated by "/": ' + repr(fields[0]))
+        mailbox = [' '] * 64
+        for rank, row in zip(range(7, -1, -1), ranks):
+            file = 0
+            for i, char in enumerate(row):
+                if char in '12345678':
+                    if i and row[i - 1] in '12345678':
+                        raise ValueError('runs of empty squares must be written as one digit: ' + repr(row))
+                    file += int(char)
+                elif char in 'KRBNkrbn' and file < 8:
+                    mailbox[8 * rank + file] = char
+                    file += 1
+                else:
+                    raise ValueError('bad rank ' + repr(row))
+            if file != 8:
+                raise ValueError('rank does not cover 8 squares: ' + repr(row))
+
+        for piece in 'RBNrbn':
+            if mailbox.count(piece) > _PIECE_COUNTS[piece]:
+                raise ValueError('more than %d of %r on the board' % (_PIECE_COUNTS[piece], piece))
+
+        turn = 'white' if fields[1] == 'w' else 'black'
+        near_win = fields[2] == '+'
+        if near_win != ('K' in mailbox[56:]):
+            raise ValueError('the row 8 flag must be "+" exactly when the white king is on row 8')
+        if 'k' in mailbox[56:] and turn == 'black':
+            raise ValueError('black cannot be to move once its king is on row 8')
+        # The game state follows from the kings and the turn: black finishing ends the game at once, and white
+        # finishing ends it once black has had its reply
+        if 'k' in mailbox[56:]:
+            game_state = 'TIE' if near_win else 'BLACK WINS'
+        elif near_win and turn == 'white':
+            game_state = 'WHITE WINS'
+        else:
+            game_state = 'UNFINISHED'
+        game = cls.from_mailbox(mailbox, turn, near_win, game_state)
+        if game.wcheck_checker() or game.bcheck_checker():
+            raise ValueError('neither king can be in check in this variant')
+        if game_state == 'UNFINISHED' and not game._has_legal_move():
+            game._game_state = 'WHITE WINS' if near_win else 'TIE'
+        return game
+
+    def to_position(self):
+        """Returns the position as a compact string: the board from row 8 down to row 1 with ranks separated by
+        "/", piece letters for pieces and digits for runs of empty squares, then "w" or "b" for whose turn it is,
+        then "+" if white has already reached row 8 or "-" if not. The starting position is
+        "8/8/8/8/8/8/RBN2nbr/KBN2nbk w -"."""
+        ranks = []
+        for rank in range(7, -1, -1):
+            row = ''
+            empty = 0
+            for piece in self._mailbox[8 * rank:8 * rank + 8]:
+                if piece == ' ':
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += piece
+            ranks.append(row + str(empty) if empty else row)
+        return '/'.join(ranks) + (' w ' if self._turn == 'white' else ' b ') + ('+' if self._near_win else '-')
+
+    def _setup(self, mailbox, turn, near_win, game_state):
+        """Initializes every data member from a mailbox list (which the game takes over) and the game flags"""
+        # One bitboard per piece type and color, one occupancy bitboard per color, and a 64 square mailbox
+        # (indexed a1 = 0 ... h8 = 63) for answering "what is on this square" without scanning the bitboards
+        self._pieces = {'K': 0, 'R': 0, 'B': 0, 'N': 0, 'k': 0, 'r': 0, 'b': 0, 'n': 0}
+        self._colors = {'white': 0, 'black': 0}
+        self._mailbox = mailbox
+        for sq, piece in enumerate(mailbox):
+            if piece != ' ':
+                self._pieces[piece] |= BIT[sq]
+                self._colors['white' if piece.isupper() else 'black'] |= BIT[sq]
+        self._reset_attacks()
+        self._game_state = game_state
+        self._near_win = near_win
+        self._turn = turn
+        self._hash = hash_position(self._mailbox, self._turn, self._near_win)
+        # One packed record per move made so far, most recent last, holding everything undo_move needs: from and
+        # to squares, moved and captured piece, and the turn, row 8 flag and game state from before the move
+        self._history = array('I')
+        self._on_reject = print_rejection
 
     def get_game_state(self):
         """Returns state of game"""
         return self._game_state
 
+    def get_turn(self):
+        """Returns whose turn it is, 'white' or 'black'"""
+        return self._turn
+
+    def get_near_win(self):
+        """Returns True if white has reached row 8 and black has its last move"""
+        return self._near_win
+
+    def get_board(self):
+        """Returns a copy of the board as a list of 64 piece letters indexed a1 = 0 ... h8 = 63, ' ' for empty"""
+        return list(self._mailbox)
+
+    def get_bitboard(self, piece):
+        """Returns the bitboard of the squares holding piece, one of 'KRBNkrbn', with bit n set for a piece on square
+        n (a1 = 0 ... h8 = 63)"""
+        return self._pieces[piece]
+
+    @property
+    def wKingLoc(self):
+        """Returns the square the white king is on"""
+        return SQUARE_NAMES[self._pieces['K'].bit_length() - 1]
+
+    @property
+    def bKingLoc(self):
+        """Returns the square the black king is on"""
+        return SQUARE_NAMES[self._pieces['k'].bit_length() - 1]
+
+    def get_hash(self):
+        """Returns the 64-bit Zobrist hash of the position (piece placement, whose turn it is and whether white
+        has already reached row 8)"""
+        return self._hash
+
     def get_col(self, coord):
         """Returns column of piece square"""
         return self.filestoCols[coord[0]]
@@ -58,474 +244,380 @@ class ChessVar:
         """Returns row of piece square"""
         return self.rankstoRows[coord[1]]
 
+    def get_index(self, coord):
+        """Returns the 0-63 bitboard index of a square in algebraic notation"""
+        return SQUARE_INDEX[coord]
+
     def king_legal(self, orig, dest):
         """Outlines what squares are within king's valid movement"""
-        if (abs(ord(dest[0]) - ord(orig[0])) <= 1) and (abs(ord(dest[1]) - ord(orig[1])) <= 1):
-            return True
+        return bool(KING_ATTACKS[SQUARE_INDEX[orig]] & BIT[SQUARE_INDEX[dest]])
 
     def rook_legal(self, orig, dest):
         """Defines what squares are within rook's valid movements"""
-        if (abs(ord(dest[0]) - ord(orig[0])) == 0) and (abs(ord(dest[1]) - ord(orig[1])) != 0):
-            orig_row = self.get_row(orig)
-            dest_row = self.get_row(dest)
-            column = self.get_col(orig)
-            rows = int(orig_row) - int(dest_row)
-            if rows > 0:
-                for i in range(rows):
-                    if self._board[i][column] != ' ':
-                        return False
-                else:
-                    return True
-        if (abs(ord(dest[0]) - ord(orig[0])) != 0) and (abs(ord(dest[1]) - ord(orig[1])) == 0):
-            row = self.get_row(orig)
-            orig_col = self.get_col(orig)
-            dest_col = self.get_col(dest)
-            for square in self._board[row][orig_col + 1:dest_col - 1]:
-                pieces = 0
-                if square != ' ':
-                    pieces += 1
-                    if pieces > 2:
-                        return False
+        occupied = self._colors['white'] | self._colors['black']
+        return bool(rook_attacks(SQUARE_INDEX[orig], occupied) & BIT[SQUARE_INDEX[dest]])
 
     def bishop_legal(self, orig, dest):
         """Outlines what bishop moves are possible"""
+        occupied = self._colors['white'] | self._colors['black']
+        return bool(bishop_attacks(SQUARE_INDEX[orig], occupied) & BIT[SQUARE_INDEX[dest]])
 
-        def is_valid_position(x, y):
-            """Keeps movement on board"""
-            return 0 <= x < 8 and 0 <= y < 8
+    def knight_legal(self, orig, dest):
+        """Outlines what knight moves are possible"""
+        return bool(KNIGHT_ATTACKS[SQUARE_INDEX[orig]] & BIT[SQUARE_INDEX[dest]])
 
-        start_x = self.get_col(orig)
-        start_y = self.get_row(dest)
-        moves = []
+    def _reset_attacks(self):
+        """Rebuilds the per-square and per-color attack maps from scratch"""
+        occupied = self._colors['white'] | self._colors['black']
+        self._attack_from = array('Q', bytes(512))
+        for piece, bb in self._pieces.items():
+            for sq in iter_bits(bb):
+                self._attack_from[sq] = piece_attacks(piece, sq, occupied)
+        self._attacks = {'white': self._color_attacks('white'), 'black': self._color_attacks('black'),
+                         'sliders': self._slider_attacks()}
 
-        # Diagonal movement directions (4 possible diagonals)
-        directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+    def _color_attacks(self, color):
+        """Returns the union of the attack sets of every piece of one color"""
+        return self._union(self._colors[color])
 
-        for dx, dy in directions:
-            x, y = start_x + dx, start_y + dy
-            while is_valid_position(x, y):
-                moves.append((x, y))
-                x, y = x + dx, y + dy
+    def _slider_attacks(self):
+        """Returns the union of the attack sets of every rook and bishop of both colors"""
+        pieces = self._pieces
+        return self._union(pieces['R'] | pieces['B'] | pieces['r'] | pieces['b'])
 
-        if ((self._board[8 - int(dest[1])]), (self._board[ord(dest[0]) - ord('a')])) in moves:
-            return True
-
-    def knight_legal(self, orig, dest):
-        """Outlines what knight moves are possible"""
-        if (abs(ord(dest[0]) - ord(orig[0])) == 1) or (abs(ord(dest[1]) - ord(orig[1])) == 1):
-            if (abs(ord(dest[0]) - ord(orig[0])) == 2) or (abs(ord(dest[1]) - ord(orig[1])) == 2):
-                return True
+    def _union(self, bb):
+        """Returns the union of the attack sets of the pieces on the squares in bb"""
+        attacks = 0
+        attack_from = self._attack_from
+        while bb:
+            low = bb & -bb
+            attacks |= attack_from[low.bit_length() - 1]
+            bb ^= low
+        return attacks
 
     def wcheck_checker(self):
         """Checks if white king is in check"""
-        kingpos = self.wKingLoc
-        kingsafe = True
-        for row in self._board:
-            for square in row:
-                if square != 'K' and square != ' ':
-                    if square == 'k':
-                        if self.king_legal(self.lastTo[0], kingpos):
-                            kingsafe = False
-                            return kingsafe
-                    elif square == 'r':
-                        if self.rook_legal(self.lastTo[0], kingpos):
-                            kingsafe = False
-                            return kingsafe
-                    elif square == 'b':
-                        if self.bishop_legal(self.lastTo[0], kingpos):
-                            kingsafe = False
-                            return kingsafe
-                    elif square == 'n':
-                        if self.knight_legal(self.lastTo[0], kingpos):
-                            kingsafe = False
-                            return kingsafe
+        return bool(self._attacks['black'] & self._pieces['K'])
 
     def bcheck_checker(self):
         """Checks if black king is in check"""
-        kingpos = self.bKingLoc
-        kingsafe = True
-        for row in self._board:
-            for square in row:
-                if square != 'k' and square != ' ':
-                    if square == 'K':
-                        if self.king_legal(self.lastTo[0], kingpos):
-                            kingsafe = False
-                            return kingsafe
-                    elif square == 'R':
-                        if self.rook_legal(self.lastTo[0], kingpos):
-                            kingsafe = False
-                            return kingsafe
-                    elif square == 'B':
-                        if self.bishop_legal(self.lastTo[0], kingpos):
-                            kingsafe = False
-                            return kingsafe
-                    elif square == 'N':
-                        if self.knight_legal(self.lastTo[0], kingpos):
-                            kingsafe = False
-                            return kingsafe
+        return bool(self._attacks['white'] & self._pieces['k'])
+
+    def _move_bits(self, piece, orig, dest, captured, changed=None):
+        """Moves piece from orig to dest on the bitboards and mailbox, removing any captured piece, and updates
+        the attack maps. If changed is a list, what _unmove_bits needs to restore the attack maps without
+        recomputing them is appended to it."""
+        pieces = self._pieces
+        colors = self._colors
+        color, enemy = ('white', 'black') if piece.isupper() else ('black', 'white')
+        move = BIT[orig] | BIT[dest]
+        pieces[piece] ^= move
+        colors[color] ^= move
+        if captured != ' ':
+            pieces[captured] ^= BIT[dest]
+            colors[enemy] ^= BIT[dest]
+        self._mailbox[orig] = ' '
+        self._mailbox[dest] = piece
+        self._refresh_attacks(orig, dest, color, enemy, captured != ' ', changed)
+
+    def _unmove_bits(self, piece, orig, dest, captured, changed=None):
+        """Takes back a _move_bits call. The attack maps are restored from changed if it was passed to
+        _move_bits, and recomputed for the squares involved otherwise."""
+        color, enemy = ('white', 'black') if piece.isupper() else ('black', 'white')
+        move = BIT[orig] | BIT[dest]
+        self._pieces[piece] ^= move
+        self._colors[color] ^= move
+        if captured != ' ':
+            self._pieces[captured] ^= BIT[dest]
+            self._colors[enemy] ^= BIT[dest]
+        self._mailbox[orig] = piece
+        self._mailbox[dest] = captured
+        if changed is None:
+            self._refresh_attacks(orig, dest, color, enemy, captured != ' ')
+            return
+        self._attacks['white'], self._attacks['black'], self._attacks['sliders'] = changed[-3:]
+        attack_from = self._attack_from
+        for i in range(0, len(changed) - 3, 2):
+            attack_from[changed[i]] = changed[i + 1]
+
+    def _refresh_attacks(self, orig, dest, color, enemy, enemy_changed, changed=None):
+        """Updates the attack maps after a piece of color moved between orig and dest (in either direction).
+        Only the pieces on those two squares and the sliders whose rays ran through them can attack different
+        squares now, and enemy's union only needs rebuilding if one of its pieces changed. If changed is a list,
+        a flat list of (square, old attacks) pairs followed by the old white, black and slider unions is
+        appended to it."""
+        pieces = self._pieces
+        colors = self._colors
+        mailbox = self._mailbox
+        attack_from = self._attack_from
+        occupied = colors['white'] | colors['black']
+        move = BIT[orig] | BIT[dest]
+        if changed is not None:
+            changed += (orig, attack_from[orig], dest, attack_from[dest])
+        sliders = (pieces['R'] | pieces['B'] | pieces['r'] | pieces['b']) & ~move
+        while sliders:
+            low = sliders & -sliders
+            sliders ^= low
+            sq = low.bit_length() - 1
+            if attack_from[sq] & move:
+                if changed is not None:
+                    changed += (sq, attack_from[sq])
+                attack_from[sq] = piece_attacks(mailbox[sq], sq, occupied)
+                if not enemy_changed and colors[enemy] & low:
+                    enemy_changed = True
+        attack_from[orig] = piece_attacks(mailbox[orig], orig, occupied)
+        attack_from[dest] = piece_attacks(mailbox[dest], dest, occupied)
+        attacks = self._attacks
+        if changed is not None:
+            changed += (attacks['white'], attacks['black'], attacks['sliders'])
+        attacks[color] = self._color_attacks(color)
+        if enemy_changed:
+            attacks[enemy] = self._color_attacks(enemy)
+        attacks['sliders'] = self._slider_attacks()
+
+    def _line_blockers(self):
+        """Returns the squares whose piece is the only thing between a king and an enemy rook or bishop on the same
+        line. Moving one of those pieces off the line is the only way a move can uncover an attack on a king."""
+        pieces = self._pieces
+        mailbox = self._mailbox
+        occupied = self._colors['white'] | self._colors['black']
+        blockers = 0
+        for king, rook, bishop in (('K', 'r', 'b'), ('k', 'R', 'B')):
+            sq = pieces[king].bit_length() - 1
+            for direction in range(8):
+                hits = RAYS[direction][sq] & occupied
+                if not hits:
+                    continue
+                first = lsb(hits) if direction < 4 else msb(hits)
+                hits = RAYS[direction][first] & occupied
+                if not hits:
+                    continue
+                second = mailbox[lsb(hits) if direction < 4 else msb(hits)]
+                if second == (rook if direction in ROOK_DIRECTIONS else bishop):
+                    blockers |= BIT[first]
+        return blockers
+
+    def _keeps_kings_safe(self, piece, orig, dest, captured, blockers=None):
+        """Returns True if moving piece from orig to dest leaves neither king attacked. blockers is
+        _line_blockers() for the current position, which callers testing many moves from one position can pass
+        in."""
+        attacks = self._attacks
+        pieces = self._pieces
+        occupied = self._colors['white'] | self._colors['black']
+        if blockers is None:
+            blockers = self._line_blockers()
+        if piece == 'K' or piece == 'k':
+            if piece == 'K':
+                enemy_attacks, enemy_king, rooks, bishops = attacks['black'], pieces['k'], pieces['r'], pieces['b']
+            else:
+                enemy_attacks, enemy_king, rooks, bishops = attacks['white'], pieces['K'], pieces['R'], pieces['B']
+            if enemy_attacks & BIT[dest] or KING_ATTACKS[dest] & enemy_king:
+                return False
+            if attacks['sliders'] & BIT[orig]:
+                # The king itself may have been the blocker hiding dest from a rook or bishop behind it
+                after = occupied & ~BIT[orig] | BIT[dest]
+                if rook_attacks(dest, after) & rooks & ~BIT[dest] or \
+                        bishop_attacks(dest, after) & bishops & ~BIT[dest]:
+                    return False
+            if not blockers & BIT[orig]:
+                return True
+        elif not blockers & BIT[orig]:
+            # Leaving orig opens no rook or bishop line onto a king. Filling dest can only block lines and a
+            # capture only removes attacks, so just the moved piece's new squares matter.
+            enemy_king = pieces['k'] if piece.isupper() else pieces['K']
+            return not piece_attacks(piece, dest, occupied & ~BIT[orig] | BIT[dest]) & enemy_king
+        changed = []
+        self._move_bits(piece, orig, dest, captured, changed)
+        safe = not (self.wcheck_checker() or self.bcheck_checker())
+        self._unmove_bits(piece, orig, dest, captured, changed)
+        return safe
+
+    def set_rejection_hook(self, hook):
+        """Sets the function make_move and undo_move call with the Rejection whenever they refuse a move. The
+        default prints the rejection's message; None makes both silent."""
+        self._on_reject = hook
 
     def make_move(self, fromsq, tosq):
         """Determines if player is black or white and then decides if the move is valid through a
         series of validations"""
-        if self._game_state == 'UNFINISHED':
-            if self._turn == 'white':
-                if fromsq in self._squares:
-                    if tosq in self._squares:
-                        if fromsq != tosq:
-                            piece = self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')]
-                            if piece.isupper():
-                                self.lastTo[0] = tosq
-
-                                if piece == 'K':
-                                    if self.king_legal(fromsq, tosq):
-                                        destination = self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')]
-                                        if destination == ' ':
-                                            if self.wcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            if self.bcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                            self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'K'
-                                            self.wKingLoc = tosq
-                                            if 'K' in self._board[0]:
-                                                self._near_win = True
-                                                self._turn = 'black'
-                                                return True
-                                            else:
-                                                self._turn = 'black'
-                                                return True
-                                        elif destination != ' ':
-                                            if destination.isupper():
-                                                print("Invalid Move: Can't move piece onto another of your pieces.")
-                                                return False
-                                            else:
-                                                if self.wcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                if self.bcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                                self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'K'
-                                                self.wKingLoc = tosq
-                                                if 'K' in self._board[0]:
-                                                    self._near_win = True
-                                                    self._turn = 'black'
-                                                    return True
-                                                else:
-                                                    self._turn = 'black'
-                                                    return True
-                                    else:
-                                        print("Invalid Move: King can't move there.")
-                                        return False
-
-                                elif piece == 'R':
-                                    if self.rook_legal(fromsq, tosq):
-                                        destination = self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')]
-                                        if destination == ' ':
-                                            if self.wcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            if self.bcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                            self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'R'
-                                            self._turn = 'black'
-                                            return True
-                                        elif destination == 'k':
-                                            print('Invalid Movement: Cannot Take King.')
-                                            return False
-                                        elif destination != ' ':
-                                            if destination.isupper():
-                                                print("Invalid Move: Can't move piece onto another of your pieces.")
-                                                return False
-                                            else:
-                                                if self.wcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                if self.bcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                                self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'R'
-                                                self._turn = 'black'
-                                                return True
-                                    else:
-                                        print("Invalid Move: Rook can't move there.")
-                                        return False
-
-                                elif piece == 'B':
-                                    if self.bishop_legal(fromsq, tosq):
-                                        destination = self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')]
-                                        if destination == ' ':
-                                            if self.wcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            if self.bcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                            self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'B'
-                                            self._turn = 'black'
-                                            return True
-                                        elif destination == 'k':
-                                            print('Invalid Movement: Cannot Take King.')
-                                            return False
-                                        elif destination != ' ':
-                                            if destination.isupper():
-                                                print("Invalid Move: Can't move piece onto another of your pieces.")
-                                                return False
-                                            else:
-                                                if self.wcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                if self.bcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                                self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'B'
-                                                self._turn = 'black'
-                                                return True
-                                    else:
-                                        print("Invalid Move: Bishop can't move there.")
-                                        return False
-
-                                elif piece == 'N':
-                                    if self.knight_legal(fromsq, tosq):
-                                        destination = self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')]
-                                        if destination == ' ':
-                                            if self.wcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            if self.bcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                            self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'N'
-                                            self._turn = 'black'
-                                            return True
-                                        elif destination == 'k':
-                                            print('Invalid Movement: Cannot Take King.')
-                                            return False
-                                        elif destination != ' ':
-                                            if destination.isupper():
-                                                print("Invalid Move: Can't move piece onto another of your pieces.")
-                                                return False
-                                            else:
-                                                if self.wcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                if self.bcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                                self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'N'
-                                                self._turn = 'black'
-                                                return True
-                                    else:
-                                        print("Invalid Move: Knight can't move there.")
-                                        return False
-
-
-                            else:
-                                print("Invalid Move: Can't move other player's piece.")
-                                return False
-                        else:
-                            print("Invalid Move: Origin and destination can't be the same")
-                            return False
-                    else:
-                        print('Invalid Move: Destination not on board.')
-                        return False
-                else:
-                    print('Invalid Move: Origin not on board.')
-                    return False
-            else:
-                print('Invalid Move: Not your piece.')
-                return False
+        reason = self.try_move(fromsq, tosq)
+        if reason is None:
+            return True
+        if self._on_reject is not None:
+            self._on_reject(reason)
+        return False
 
+    def try_move(self, fromsq, tosq):
+        """Makes the move like make_move but without any output. Returns None if the move was made, otherwise the
+        Rejection saying why it was not."""
+        if self._game_state != 'UNFINISHED':
+            return Rejection.GAME_OVER
+        orig = SQUARE_INDEX.get(fromsq)
+        if orig is None:
+            return Rejection.ORIGIN_OFF_BOARD
+        dest = SQUARE_INDEX.get(tosq)
+        if dest is None:
+            return Rejection.DESTINATION_OFF_BOARD
+        return self.try_move_index(orig, dest)
 
-            if self._turn == 'black':
-                if fromsq in self._squares:
-                    if tosq in self._squares:
-                        if fromsq != tosq:
-                            piece = self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')]
-                            if piece.islower():
-                                self.lastTo[0] = tosq
-
-                                if piece == 'k':
-                                    if self.king_legal(fromsq, tosq):
-                                        destination = self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')]
-                                        if destination == ' ':
-                                            if self.bcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            if self.wcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                            self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'k'
-                                            self.bKingLoc = tosq
-                                            if 'k' in self._board[0]:
-                                                if self._near_win is True:
-                                                    self._game_state = 'TIE'
-                                                    return True
-                                                else:
-                                                    self._game_state = 'BLACK WINS'
-                                                    return True
-                                            else:
-                                                self._turn = 'white'
-                                                return True
-                                        elif destination != ' ':
-                                            if destination.islower():
-                                                print("Invalid Move: Can't move piece onto another of your pieces.")
-                                                return False
-                                            else:
-                                                if self.bcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                if self.wcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                                self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'k'
-                                                self.bKingLoc = tosq
-                                                if 'k' in self._board[0]:
-                                                    if self._near_win is True:
-                                                        self._game_state = 'TIE'
-                                                        return True
-                                                    else:
-                                                        self._game_state = 'BLACK WINS'
-                                                        return True
-                                                else:
-                                                    self._turn = 'white'
-                                                    return True
-                                    else:
-                                        print("Invalid Move: King can't move there.")
-                                        return False
-
-                                elif piece == 'r':
-                                    if self.rook_legal(fromsq, tosq):
-                                        destination = self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')]
-                                        if destination == ' ':
-                                            if self.bcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            if self.wcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                            self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'r'
-                                            self._turn = 'white'
-                                            return True
-                                        elif destination == 'K':
-                                            print('Invalid Movement: Cannot Take King.')
-                                            return False
-                                        elif destination != ' ':
-                                            if destination.islower():
-                                                print("Invalid Move: Can't move piece onto another of your pieces.")
-                                                return False
-                                            else:
-                                                if self.bcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                if self.wcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                                self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'r'
-                                                self._turn = 'white'
-                                                return True
-                                    else:
-                                        print("Invalid Move: Rook can't move there.")
-                                        return False
-
-                                elif piece == 'b':
-                                    if self.bishop_legal(fromsq, tosq):
-                                        destination = self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')]
-                                        if destination == ' ':
-                                            if self.bcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            if self.wcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                            self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'b'
-                                            self._turn = 'white'
-                                            return True
-                                        elif destination == 'K':
-                                            print('Invalid Movement: Cannot Take King.')
-                                            return False
-                                        elif destination != ' ':
-                                            if destination.islower():
-                                                print("Invalid Move: Can't move piece onto another of your pieces.")
-                                                return False
-                                            else:
-                                                if self.bcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                if self.wcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                                self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'b'
-                                                self._turn = 'white'
-                                                return True
-                                    else:
-                                        print("Invalid Move: Bishop can't move there.")
-                                        return False
-
-                                elif piece == 'n':
-                                    if self.knight_legal(fromsq, tosq):
-                                        destination = self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')]
-                                        if destination == ' ':
-                                            if self.bcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            if self.wcheck_checker():
-                                                print("Invalid Move: King can't be in check.")
-                                                return False
-                                            self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                            self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'n'
-                                            self._turn = 'white'
-                                            return True
-                                        elif destination == 'K':
-                                            print('Invalid Movement: Cannot Take King.')
-                                            return False
-                                        elif destination != ' ':
-                                            if destination.islower():
-                                                print("Invalid Move: Can't move piece onto another of your pieces.")
-                                                return False
-                                            else:
-                                                if self.bcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                if self.wcheck_checker():
-                                                    print("Invalid Move: King can't be in check.")
-                                                    return False
-                                                self._board[8 - int(fromsq[1])][ord(fromsq[0]) - ord('a')] = ' '
-                                                self._board[8 - int(tosq[1])][ord(tosq[0]) - ord('a')] = 'n'
-                                                self._turn = 'white'
-                                                return True
-
-                            else:
-                                print("Invalid Move: Can't move other player's piece.")
-                                return False
-                        else:
-                            print("Invalid Move: Origin and destination can't be the same")
-                            return False
-                    else:
-                        print('Invalid Move: Destination not on board.')
-                        return False
-                else:
-                    print('Invalid Move: Origin not on board.')
-                    return False
-            else:
-                print('Invalid Move: Not your piece.')
-                return False
+    def make_move_index(self, orig, dest):
+        """Makes the move between two 0-63 square indices (a1 = 0, h8 = 63) like make_move, skipping algebraic
+        notation entirely"""
+        reason = self.try_move_index(orig, dest)
+        if reason is None:
+            return True
+        if self._on_reject is not None:
+            self._on_reject(reason)
+        return False
+
+    def make_packed_move(self, move):
+        """Makes a packed move (origin * 64 + destination, as yielded by legal_packed_moves) like make_move"""
+        return self.make_move_index(move >> 6, move & 63)
+
+    def try_move_index(self, orig, dest):
+        """Makes the move between two 0-63 square indices like try_move. Returns None if the move was made,
+        otherwise the Rejection saying why it was not."""
+        if self._game_state != 'UNFINISHED':
+            return Rejection.GAME_OVER
+        if not 0 <= orig < 64:
+            return Rejection.ORIGIN_OFF_BOARD
+        if not 0 <= dest < 64:
+            return Rejection.DESTINATION_OFF_BOARD
+        if orig == dest:
+            return Rejection.SAME_SQUARE
+
+        piece = self._mailbox[orig]
+        white = self._turn == 'white'
+        if piece == ' ' or piece.isupper() != white:
+            return Rejection.NOT_YOUR_PIECE
+
+        occupied = self._colors['white'] | self._colors['black']
+        if not piece_attacks(piece, orig, occupied) & BIT[dest]:
+            return _CANT_MOVE_THERE[piece]
+
+        destination = self._mailbox[dest]
+        if destination == ('k' if white else 'K'):
+            return Rejection.TAKES_KING
+        if destination != ' ' and destination.isupper() == white:
+            return Rejection.OWN_PIECE
+
+        # Neither player may leave either king attacked
+        if not self._keeps_kings_safe(piece, orig, dest, destination):
+            return Rejection.KING_IN_CHECK
+
+        self._play(orig, dest)
+        if self._game_state == 'UNFINISHED' and not self._has_legal_move():
+            # A player with no legal move cannot go on. That only helps white when black was the one who still
+            # needed to answer white reaching row 8.
+            self._game_state = 'WHITE WINS' if self._near_win else 'TIE'
+        return None
+
+    def _play(self, orig, dest):
+        """Plays a move that is already known to be legal, then updates the king locations, turn and game state.
+        Pushes what undo_move needs to restore the position onto the move stack. It does not look for a player
+        left with no legal move, which try_move_index does, so search and perft, which generate the next moves
+        anyway, do not pay for generating them twice."""
+        piece = self._mailbox[orig]
+        captured = self._mailbox[dest]
+        self._move_bits(piece, orig, dest, captured)
+        self._history.append(orig | dest << 6 | _PIECE_CODE[piece] << 12 | _PIECE_CODE[captured] << 16 |
+                             (self._turn == 'black') << 20 | self._near_win << 21 |
+                             _STATE_CODE[self._game_state] << 22)
+        keys = PIECE_KEYS[piece]
+        self._hash ^= keys[orig] ^ keys[dest] ^ BLACK_TO_MOVE
+        if captured != ' ':
+            self._hash ^= PIECE_KEYS[captured][dest]
+
+        if self._turn == 'white':
+            self._turn = 'black'
+            if self._pieces['K'] & RANK_8:
+                self._near_win = True
+                self._hash ^= NEAR_WIN
         else:
-            print('Invalid Move: Game is Over.')
+            self._turn = 'white'
+            if self._pieces['k'] & RANK_8:
+                if self._near_win is True:
+                    self._game_state = 'TIE'
+                else:
+                    self._game_state = 'BLACK WINS'
+            elif self._near_win is True:
+                # Black had its one move after white finished and did not finish too
+                self._game_state = 'WHITE WINS'
+
+    def undo_move(self):
+        """Takes back the last move made, restoring any captured piece, the king locations, the turn and the game
+        state. Returns False if no moves have been made."""
+        if not self._history:
+            if self._on_reject is not None:
+                self._on_reject(Rejection.NOTHING_TO_UNDO)
             return False
+        record = self._history.pop()
+        orig, dest = record & 63, record >> 6 & 63
+        piece, captured = _PIECE_CODES[record >> 12 & 15], _PIECE_CODES[record >> 16 & 15]
+        near_win = bool(record >> 21 & 1)
+        self._unmove_bits(piece, orig, dest, captured)
+        keys = PIECE_KEYS[piece]
+        self._hash ^= keys[orig] ^ keys[dest] ^ BLACK_TO_MOVE
+        if captured != ' ':
+            self._hash ^= PIECE_KEYS[captured][dest]
+        if near_win != self._near_win:
+            self._hash ^= NEAR_WIN
+        self._turn = 'black' if record >> 20 & 1 else 'white'
+        self._near_win = near_win
+        self._game_state = _STATES[record >> 22]
+        return True
+
+    def _legal_indices(self):
+        """Yields (orig, dest) square index pairs for every legal move of the player whose turn it is"""
+        if self._game_state != 'UNFINISHED':
+            return
+        pieces = self._pieces
+        if self._turn == 'white':
+            own, enemy_king, order = self._colors['white'], pieces['k'], 'KRBN'
+        else:
+            own, enemy_king, order = self._colors['black'], pieces['K'], 'krbn'
+        occupied = self._colors['white'] | self._colors['black']
+        mailbox = self._mailbox
+        blockers = self._line_blockers()
+        for piece in order:
+            for orig in iter_bits(pieces[piece]):
+                for dest in iter_bits(piece_attacks(piece, orig, occupied) & ~own & ~enemy_king):
+                    if self._keeps_kings_safe(piece, orig, dest, mailbox[dest], blockers):
+                        yield orig, dest
+
+    def _has_legal_move(self):
+        """Returns True if the player whose turn it is has at least one legal move"""
+        for _ in self._legal_indices():
+            return True
+        return False
+
+    def legal_moves(self):
+        """Yields every legal move for the player whose turn it is as (fromsq, tosq) pairs in algebraic notation,
+        kings first. Yields nothing once the game is over."""
+        for orig, dest in self._legal_indices():
+            yield SQUARE_NAMES[orig], SQUARE_NAMES[dest]
+
+    def legal_packed_moves(self):
+        """Yields every legal move for the player whose turn it is packed as origin * 64 + destination, in the
+        same order as legal_moves"""
+        for orig, dest in self._legal_indices():
+            yield orig << 6 | dest
+
+    def perft(self, depth):
+        """Counts the positions reachable in exactly depth moves (games that end sooner are not counted). The
+        game is left as it was."""
+        if depth == 0:
+            return 1
+        moves = list(self._legal_indices())
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for orig, dest in moves:
+            self._play(orig, dest)
+            nodes += self.perft(depth - 1)
+            self.undo_move()
+        return nodes
+
+
+# Built once from _START_ROWS for ChessVar() to copy
+_START = ChessVar.from_mailbox([piece for row in reversed(_START_ROWS) for piece in row])
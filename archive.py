@@ -0,0 +1,192 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Compact binary formats for ChessVar positions and game archives. A position packs into a fixed
+# 13-byte record and a move into a 16-bit integer (6 bits from, 6 bits to). An archive file is an 8-byte header
+# followed by games, each a 16-byte header (start position, result, move count) and its packed moves. ArchiveReader
+# memory-maps an archive and hands out views straight into the file, so iterating games copies nothing.
+
+import mmap
+import struct
+
+from ChessVar import ChessVar
+from bitboard import SQUARE_INDEX, SQUARE_NAMES, pack_move, unpack_move
+
+POSITION_BYTES = 13
+GAME_HEADER_BYTES = 16
+MAGIC = b'CVGA'
+VERSION = 1
+
+# Pieces in the order their squares are stored in a position record. A captured piece is stored as square 255.
+PIECE_ORDER = 'KRBBNNkrbbnn'
+CAPTURED = 255
+GAME_STATES = ('UNFINISHED', 'TIE', 'BLACK WINS', 'WHITE WINS')
+
+_FILE_HEADER = struct.Struct('<4sHH')
+_GAME_HEADER = struct.Struct('<%dsBH' % POSITION_BYTES)
+_STATE_CODES = {state: code for code, state in enumerate(GAME_STATES)}
+
+
+def pack_position(game):
+    """Returns the 13-byte record for the position in game: the square of each piece in PIECE_ORDER (255 once
+    captured), then a flags byte holding black to move (bit 0), white already on row 8 (bit 1) and the game state
+    (bits 2-3)"""
+    squares = {piece: [] for piece in 'KRBNkrbn'}
+    for sq, piece in enumerate(game.get_board()):
+        if piece != ' ':
+            squares[piece].append(sq)
+    record = bytearray(POSITION_BYTES)
+    for i, piece in enumerate(PIECE_ORDER):
+        record[i] = squares[piece].pop() if squares[piece] else CAPTURED
+    if any(squares.values()):
+        raise ValueError('position has more pieces than a position record can hold')
+    record[12] = (game.get_turn() == 'black') | game.get_near_win() << 1 | _STATE_CODES[game.get_game_state()] << 2
+    return bytes(record)
+
+
+def unpack_position(record):
+    """Returns a new ChessVar set up from a 13-byte position record (bytes or a memoryview)"""
+    mailbox = [' '] * 64
+    for i, piece in enumerate(PIECE_ORDER):
+        if record[i] != CAPTURED:
+            mailbox[record[i]] = piece
+    flags = record[12]
+    return ChessVar.from_mailbox(mailbox, 'black' if flags & 1 else 'white', bool(flags & 2),
+                                 GAME_STATES[flags >> 2 & 3])
+
+
+def encode_move(fromsq, tosq):
+    """Returns the packed 16-bit move for a move in algebraic notation. Raises ValueError for a square that is not
+    on the board."""
+    if fromsq not in SQUARE_INDEX or tosq not in SQUARE_INDEX:
+        raise ValueError('move %s%s is not between two squares on the board' % (fromsq, tosq))
+    return pack_move(SQUARE_INDEX[fromsq], SQUARE_INDEX[tosq])
+
+
+def decode_move(move):
+    """Returns the (fromsq, tosq) algebraic notation of a packed move"""
+    orig, dest = unpack_move(move)
+    return SQUARE_NAMES[orig], SQUARE_NAMES[dest]
+
+
+class ArchiveWriter:
+    """Class that appends games to an archive file. Use it as a context manager or call close()."""
+
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self._file.write(_FILE_HEADER.pack(MAGIC, VERSION, 0))
+        self._games = 0
+
+    def write_game(self, moves, start=None):
+        """Replays moves ((fromsq, tosq) pairs or packed integers) from start (a ChessVar, default the starting
+        position, left unchanged) and appends the game with its result. Raises ValueError at the first illegal
+        move."""
+        game = unpack_position(pack_position(start)) if start is not None else ChessVar()
+        record = pack_position(game)
+        packed = []
+        for move in moves:
+            if not isinstance(move, int):
+                move = encode_move(*move)
+            reason = game.try_move_index(*unpack_move(move))
+            if reason is not None:
+                raise ValueError('move %d (%s%s) rejected: %s' % ((len(packed),) + decode_move(move) + (reason.name,)))
+            packed.append(move)
+        if len(packed) > 0xFFFF:
+            raise ValueError('game is too long for an archive record')
+        self._file.write(_GAME_HEADER.pack(record, _STATE_CODES[game.get_game_state()], len(packed)))
+        self._file.write(struct.pack('<%dH' % len(packed), *packed))
+        self._games += 1
+
+    def get_games_written(self):
+        """Returns how many games have been written"""
+        return self._games
+
+    def close(self):
+        """Flushes and closes the file"""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ArchivedGame:
+    """Class that is a zero-copy view of one game inside a memory-mapped archive. It holds its own slice of the
+    map, so it stays usable after the reader is closed."""
+
+    def __init__(self, view, result, count):
+        self._view = view
+        self._result = result
+        self._count = count
+
+    def get_start_record(self):
+        """Returns the 13-byte start position record as a memoryview into the archive"""
+        return self._view[:POSITION_BYTES]
+
+    def get_result(self):
+        """Returns the game state the game ended in"""
+        return GAME_STATES[self._result]
+
+    def get_move_count(self):
+        """Returns how many moves the game has"""
+        return self._count
+
+    def get_moves(self):
+        """Returns the packed moves as a memoryview of unsigned 16-bit integers into the archive"""
+        # Native-order cast, since the archive is written little-endian and read on little-endian machines
+        return self._view[GAME_HEADER_BYTES:].cast('H')
+
+    def get_move_pairs(self):
+        """Returns the moves as a list of (fromsq, tosq) pairs"""
+        return [decode_move(move) for move in self.get_moves()]
+
+    def replay(self):
+        """Returns a ChessVar with the start position and every move played"""
+        game = unpack_position(self.get_start_record())
+        for move in self.get_moves():
+            game.try_move_index(move >> 6, move & 63)
+        return game
+
+
+class ArchiveReader:
+    """Class that memory-maps an archive file and iterates over its games without copying or parsing move text.
+    close() can be called while games or views it handed out are still alive; the file stays mapped, and they stay
+    usable, until the last of them is gone."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, version, _ = _FILE_HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('%s is not a version %d ChessVar archive' % (path, VERSION))
+
+    def __iter__(self):
+        view = self._view
+        offset = _FILE_HEADER.size
+        end = len(view)
+        while offset < end:
+            _, result, count = _GAME_HEADER.unpack_from(view, offset)
+            size = GAME_HEADER_BYTES + 2 * count
+            yield ArchivedGame(view[offset:offset + size], result, count)
+            offset += size
+
+    def close(self):
+        """Unmaps and closes the file. A game or view still held elsewhere keeps the mapping alive until it is
+        released."""
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # The last view to go releases the map, which unmaps it
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,187 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Vectorized evaluation of many ChessVar positions at once with NumPy. Positions come in as an (N, 64)
+# int8 array of piece codes (0 for empty, then 1-8 for 'KRBNkrbn', squares a1 = 0 to h8 = 63) or as an (N, 8) uint64
+# array of one bitboard per piece type. analyse() computes the attack set of every piece, each color's attacked
+# squares, king-in-check flags and king distance to row 8 for all N positions with array operations, using
+# Kogge-Stone fills for the rook and bishop rays. Running this module cross-checks it against ChessVar.
+
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError('batch.py needs NumPy (pip install numpy)') from None
+
+from ChessVar import ChessVar
+from bitboard import BIT, FILE_A, FILE_H, FULL, KING_ATTACKS, KNIGHT_ATTACKS, SQUARE_NAMES
+
+PIECE_CODES = ' KRBNkrbn'
+
+_BITS = np.array(BIT, dtype=np.uint64)
+_KING = np.array(KING_ATTACKS, dtype=np.uint64)
+_KNIGHT = np.array(KNIGHT_ATTACKS, dtype=np.uint64)
+# (shift, mask of squares a step may land on without wrapping around a board edge) for each ray direction
+_ROOK_STEPS = ((8, FULL), (-8, FULL), (1, FULL ^ FILE_A), (-1, FULL ^ FILE_H))
+_BISHOP_STEPS = ((9, FULL ^ FILE_A), (7, FULL ^ FILE_H), (-7, FULL ^ FILE_A), (-9, FULL ^ FILE_H))
+
+
+def encode_boards(games):
+    """Returns an (N, 64) int8 array of piece codes for a sequence of ChessVar games"""
+    return np.array([[PIECE_CODES.index(piece) for piece in game.get_board()] for game in games], dtype=np.int8)
+
+
+def encode_bitboards(games):
+    """Returns an (N, 8) uint64 array with the bitboard of each piece type in 'KRBNkrbn' order for a sequence of
+    ChessVar games"""
+    return np.array([[game.get_bitboard(piece) for piece in PIECE_CODES[1:]] for game in games], dtype=np.uint64)
+
+
+def boards_from_bitboards(bitboards):
+    """Converts an (N, 8) uint64 array of piece bitboards into an (N, 64) int8 array of piece codes"""
+    bitboards = np.asarray(bitboards, dtype=np.uint64)
+    boards = np.zeros((len(bitboards), 64), dtype=np.int8)
+    for code in range(1, 9):
+        boards[(bitboards[:, code - 1, None] & _BITS) != 0] = code
+    return boards
+
+
+def _shift(bb, shift):
+    """Shifts every bitboard in an array up (positive) or down (negative), dropping bits that fall off the board"""
+    return bb << np.uint64(shift) if shift > 0 else bb >> np.uint64(-shift)
+
+
+def _slide(generators, empty, steps):
+    """Returns the squares the sliders in generators reach along the given steps, stopping at (and including) the
+    first occupied square. Uses an occluded Kogge-Stone fill, so each direction takes three doubling steps."""
+    attacks = np.zeros_like(generators)
+    for shift, mask in steps:
+        mask = np.uint64(mask)
+        gen = generators
+        open_ = empty & mask
+        gen = gen | (open_ & _shift(gen, shift))
+        open_ = open_ & _shift(open_, shift)
+        gen = gen | (open_ & _shift(gen, 2 * shift))
+        open_ = open_ & _shift(open_, 2 * shift)
+        gen = gen | (open_ & _shift(gen, 4 * shift))
+        attacks |= _shift(gen, shift) & mask
+    return attacks
+
+
+class BatchEvaluation:
+    """Class that holds the vectorized analysis of N positions"""
+
+    def __init__(self, boards, attack_from, white_attacks, black_attacks, white_king, black_king):
+        self._boards = boards
+        self._attack_from = attack_from
+        self._white_attacks = white_attacks
+        self._black_attacks = black_attacks
+        self._white_king = white_king
+        self._black_king = black_king
+
+    def get_boards(self):
+        """Returns the (N, 64) int8 piece codes that were analysed"""
+        return self._boards
+
+    def get_attack_from(self):
+        """Returns an (N, 64) uint64 array with the attack set of the piece on each square (0 for empty squares)"""
+        return self._attack_from
+
+    def get_attacks(self, color):
+        """Returns an (N,) uint64 array of the squares attacked by 'white' or 'black'"""
+        return self._white_attacks if color == 'white' else self._black_attacks
+
+    def get_white_in_check(self):
+        """Returns an (N,) bool array, True where the white king is attacked (as wcheck_checker)"""
+        return (self._black_attacks & _BITS[self._white_king]) != 0
+
+    def get_black_in_check(self):
+        """Returns an (N,) bool array, True where the black king is attacked (as bcheck_checker)"""
+        return (self._white_attacks & _BITS[self._black_king]) != 0
+
+    def get_king_squares(self, color):
+        """Returns an (N,) array of the 0-63 square of the 'white' or 'black' king"""
+        return self._white_king if color == 'white' else self._black_king
+
+    def get_king_distance(self, color):
+        """Returns an (N,) array of how many rows the 'white' or 'black' king still has to go to reach row 8"""
+        return 7 - (self.get_king_squares(color) >> 3)
+
+
+def analyse(positions):
+    """Analyses N positions given as an (N, 64) int8 array of piece codes or an (N, 8) uint64 array of piece
+    bitboards and returns a BatchEvaluation. Every position needs one king of each color."""
+    positions = np.asarray(positions)
+    boards = boards_from_bitboards(positions) if positions.shape[1] == 8 else positions.astype(np.int8, copy=False)
+    occupied = np.bitwise_or.reduce(np.where(boards != 0, _BITS, np.uint64(0)), axis=1)
+    empty = ~occupied[:, None]
+    every_square = np.broadcast_to(_BITS, boards.shape)
+
+    kind = np.where(boards > 4, boards - 4, boards)
+    attack_from = np.where(kind == 1, _KING, np.uint64(0))
+    attack_from = np.where(kind == 4, _KNIGHT, attack_from)
+    if (kind == 2).any():
+        attack_from = np.where(kind == 2, _slide(every_square, empty, _ROOK_STEPS), attack_from)
+    if (kind == 3).any():
+        attack_from = np.where(kind == 3, _slide(every_square, empty, _BISHOP_STEPS), attack_from)
+
+    zero = np.uint64(0)
+    white_attacks = np.bitwise_or.reduce(np.where((boards >= 1) & (boards <= 4), attack_from, zero), axis=1)
+    black_attacks = np.bitwise_or.reduce(np.where(boards >= 5, attack_from, zero), axis=1)
+    white_king = np.argmax(boards == 1, axis=1)
+    black_king = np.argmax(boards == 5, axis=1)
+    return BatchEvaluation(boards, attack_from, white_attacks, black_attacks, white_king, black_king)
+
+
+def _sample_games(count, seed):
+    """Returns count games to cross-check: half reached by random legal play and half with the pieces scattered
+    at random, which puts kings in check often"""
+    rng = random.Random(seed)
+    games = []
+    while len(games) < count // 2:
+        game = ChessVar()
+        for _ in range(rng.randrange(60)):
+            moves = list(game.legal_packed_moves())
+            if not moves:
+                break
+            game.make_packed_move(rng.choice(moves))
+        games.append(game)
+    while len(games) < count:
+        pieces = 'Kk' + ''.join(piece for piece in 'RBBNNrbbnn' if rng.random() < 0.6)
+        mailbox = [' '] * 64
+        for piece, sq in zip(pieces, rng.sample(range(64), len(pieces))):
+            mailbox[sq] = piece
+        games.append(ChessVar.from_mailbox(mailbox))
+    return games
+
+
+def cross_check(count=2000, seed=0):
+    """Analyses count sample positions in one batch, from both input formats, and checks every attack set, check
+    flag and king distance against ChessVar's own methods. Raises AssertionError at the first difference and
+    returns the number of positions checked."""
+    games = _sample_games(count, seed)
+    boards = analyse(encode_boards(games))
+    bitboards = analyse(encode_bitboards(games))
+    assert (boards.get_attack_from() == bitboards.get_attack_from()).all()
+    legal = {'K': 'king_legal', 'R': 'rook_legal', 'B': 'bishop_legal', 'N': 'knight_legal'}
+    attack_from = boards.get_attack_from()
+    for n, game in enumerate(games):
+        assert boards.get_white_in_check()[n] == game.wcheck_checker(), 'white check differs in position %d' % n
+        assert boards.get_black_in_check()[n] == game.bcheck_checker(), 'black check differs in position %d' % n
+        assert boards.get_king_distance('white')[n] == 8 - int(game.wKingLoc[1])
+        assert boards.get_king_distance('black')[n] == 8 - int(game.bKingLoc[1])
+        for orig, piece in enumerate(game.get_board()):
+            if piece == ' ':
+                continue
+            method = getattr(game, legal[piece.upper()])
+            for dest in range(64):
+                if dest != orig:
+                    expected = method(SQUARE_NAMES[orig], SQUARE_NAMES[dest])
+                    assert bool(int(attack_from[n, orig]) >> dest & 1) == expected, \
+                        '%s on %s to %s differs in position %d' % (piece, SQUARE_NAMES[orig], SQUARE_NAMES[dest], n)
+    return count
+
+
+if __name__ == '__main__':
+    print('batch evaluation matches ChessVar on %d positions' % cross_check())
@@ -0,0 +1,352 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Benchmark suite for ChessVar. "run" times the core game paths (construction, legal and illegal
+# make_move, check detection, full-game replay, move generation and search) on a canned corpus of games with fixed
+# seeds and writes the results to JSON, and "compare" flags benchmarks that got slower than a baseline by more than a
+# threshold. "memory" reports the memory each live game takes after a number of moves, and "interleaved" reports
+# make_move throughput when thousands of games are advanced in round-robin order.
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from ChessVar import ChessVar
+from bitboard import SQUARE_NAMES
+from engine import Engine
+from mcts import MCTS
+from replay import replay_game
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_corpus.txt')
+RESULTS_VERSION = 1
+
+
+def random_games(count, plies, seed=0):
+    """Returns count move lists of exactly plies legal moves each, played at random with a fixed seed"""
+    rng = random.Random(seed)
+    games = []
+    while len(games) < count:
+        game = ChessVar()
+        moves = []
+        while len(moves) < plies and game.get_game_state() == 'UNFINISHED':
+            move = rng.choice(sorted(game.legal_moves()))
+            game.make_move(*move)
+            moves.append(move)
+        if len(moves) == plies:
+            games.append(moves)
+    return games
+
+
+def bench_memory(games=10000, plies=40, seed=0):
+    """Returns the average bytes held per live game after each has played plies moves"""
+    lines = random_games(50, plies, seed)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    live = []
+    for i in range(games):
+        game = ChessVar()
+        for fromsq, tosq in lines[i % len(lines)]:
+            game.make_move(fromsq, tosq)
+        live.append(game)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / games
+
+
+def bench_interleaved(games=10000, plies=40, seed=0):
+    """Advances games live games one move at a time in round-robin order and returns (moves, seconds). Every game
+    is checked afterwards against a game that played the same moves alone, so any state shared between instances
+    shows up as an error."""
+    lines = random_games(50, plies, seed)
+    live = [ChessVar() for _ in range(games)]
+    start = time.perf_counter()
+    for ply in range(plies):
+        for i, game in enumerate(live):
+            fromsq, tosq = lines[i % len(lines)][ply]
+            if not game.make_move(fromsq, tosq):
+                raise AssertionError('game %d rejected move %d' % (i, ply))
+    seconds = time.perf_counter() - start
+
+    for i, line in enumerate(lines):
+        alone = ChessVar()
+        for fromsq, tosq in line:
+            alone.make_move(fromsq, tosq)
+        for game in live[i::len(lines)]:
+            if game.get_hash() != alone.get_hash() or game.get_game_state() != alone.get_game_state():
+                raise AssertionError('interleaved game %d diverged from the same game played alone' % i)
+    return games * plies, seconds
+
+
+def corpus_games(count=100, seed=0, max_plies=200):
+    """Returns count complete games played from a fixed seed, each a list of (fromsq, tosq) pairs. Moves are picked
+    from the sorted legal moves, preferring the king move that advances furthest a third of the time, so the games
+    only depend on the rules."""
+    rng = random.Random(seed)
+    games = []
+    while len(games) < count:
+        game = ChessVar()
+        moves = []
+        while game.get_game_state() == 'UNFINISHED' and len(moves) < max_plies:
+            legal = sorted(game.legal_moves())
+            king = game.wKingLoc if game.get_turn() == 'white' else game.bKingLoc
+            advances = [move for move in legal if move[0] == king and move[1][1] > king[1]]
+            if advances and rng.random() < 1 / 3:
+                move = max(advances, key=lambda move: move[1][1])
+            else:
+                move = rng.choice(legal)
+            game.make_move(*move)
+            moves.append(move)
+        if game.get_game_state() != 'UNFINISHED':
+            games.append(moves)
+    return games
+
+
+def write_corpus(path=CORPUS, count=100, seed=0):
+    """Writes corpus_games to path, one game per line as space-separated moves like c2e3"""
+    with open(path, 'w') as file:
+        for moves in corpus_games(count, seed):
+            file.write(' '.join(fromsq + tosq for fromsq, tosq in moves) + '\n')
+
+
+def load_corpus(path=CORPUS):
+    """Reads the games written by write_corpus"""
+    with open(path) as file:
+        return [[(move[:2], move[2:]) for move in line.split()] for line in file if line.strip()]
+
+
+def _positions(corpus, max_plies=None):
+    """Returns a new game for every position along the corpus games (up to max_plies into each game)"""
+    games = []
+    for moves in corpus:
+        game = ChessVar()
+        for move in moves[:max_plies]:
+            games.append(ChessVar.from_position(game.to_position()))
+            game.make_move(*move)
+    return games
+
+
+def _illegal_moves(corpus, seed=0, per_position=4):
+    """Returns (position, fromsq, tosq) triples of moves make_move rejects, drawn with a fixed seed from positions
+    along the first 20 corpus games"""
+    rng = random.Random(seed)
+    illegal = []
+    for game in _positions(corpus[:20]):
+        game.set_rejection_hook(None)
+        found = 0
+        while found < per_position:
+            fromsq, tosq = rng.choice(SQUARE_NAMES), rng.choice(SQUARE_NAMES)
+            if game.try_move(fromsq, tosq) is None:
+                game.undo_move()
+                continue
+            illegal.append((game.to_position(), fromsq, tosq))
+            found += 1
+    return illegal
+
+
+def bench_construct():
+    """Constructs ChessVar() games"""
+    for _ in range(2000):
+        ChessVar()
+    return 2000
+
+
+def _bench_legal(corpus):
+    """Replays every corpus move five times over with make_move on games built beforehand"""
+    games = [ChessVar() for _ in range(5) for _ in corpus]
+    start = time.perf_counter()
+    moves = 0
+    for game, line in zip(games, corpus * 5):
+        for fromsq, tosq in line:
+            game.make_move(fromsq, tosq)
+        moves += len(line)
+    return moves, time.perf_counter() - start
+
+
+def _bench_illegal(illegal):
+    """Tries every canned illegal move 20 times with make_move and the rejection hook silenced"""
+    games = []
+    for position, fromsq, tosq in illegal:
+        game = ChessVar.from_position(position)
+        game.set_rejection_hook(None)
+        games.append((game, fromsq, tosq))
+    start = time.perf_counter()
+    for _ in range(20):
+        for game, fromsq, tosq in games:
+            if game.make_move(fromsq, tosq):
+                raise AssertionError('canned illegal move %s%s was accepted' % (fromsq, tosq))
+    return 20 * len(games), time.perf_counter() - start
+
+
+def _bench_checks(crowded):
+    """Runs both check detectors on crowded positions"""
+    start = time.perf_counter()
+    for _ in range(200):
+        for game in crowded:
+            game.wcheck_checker()
+            game.bcheck_checker()
+    return 400 * len(crowded), time.perf_counter() - start
+
+
+def _bench_king_safety(crowded):
+    """Lists the legal moves of crowded positions five times over, which tests every candidate move for leaving a
+    king in check"""
+    start = time.perf_counter()
+    moves = 0
+    for _ in range(5):
+        for game in crowded:
+            for _ in game.legal_moves():
+                moves += 1
+    return moves, time.perf_counter() - start
+
+
+def _bench_replay(corpus):
+    """Replays the whole corpus game by game as replay.replay_game does for bulk validation"""
+    moves = 0
+    for line in corpus:
+        state, first_illegal, played, _ = replay_game(line)
+        if first_illegal is not None:
+            raise AssertionError('corpus game rejected move %d' % first_illegal)
+        moves += played
+    return moves
+
+
+def _bench_perft():
+    """Counts perft(3) from the starting position"""
+    return ChessVar().perft(3)
+
+
+def _bench_search(positions):
+    """Searches positions to a fixed depth and returns nodes and seconds as the engine reports them"""
+    engine = Engine(4)
+    nodes = seconds = 0
+    for game in positions:
+        engine.get_table().clear()
+        result = engine.best_move(game, 3600000, 4)
+        nodes += result.get_nodes()
+        seconds += result.get_time_ms() / 1000
+    return nodes, seconds
+
+
+def _bench_mcts():
+    """Runs a fixed number of MCTS simulations in this process from a fixed seed"""
+    with MCTS(1, seed=0) as player:
+        result = player.best_move(ChessVar(), 3600000, 300)
+    return result.get_simulations(), result.get_time_ms() / 1000
+
+
+def suite(corpus):
+    """Returns {name: (unit, function)} for every benchmark. A function returns either a count of operations, timed
+    from outside, or (count, seconds) when it times itself to leave out its setup."""
+    crowded = [game for game in _positions(corpus, 8) if len(game.get_board()) - game.get_board().count(' ') == 12]
+    illegal = _illegal_moves(corpus)
+    search_positions = [ChessVar.from_position(game.to_position()) for game in _positions(corpus[:4], 6)[::6]]
+    return {
+        'construct': ('games', bench_construct),
+        'make_move_legal': ('moves', lambda: _bench_legal(corpus)),
+        'make_move_illegal': ('moves', lambda: _bench_illegal(illegal)),
+        'check_detection': ('checks', lambda: _bench_checks(crowded)),
+        'king_safety_filter': ('moves', lambda: _bench_king_safety(crowded)),
+        'replay': ('moves', lambda: _bench_replay(corpus)),
+        'perft': ('nodes', _bench_perft),
+        'search': ('nodes', lambda: _bench_search(search_positions)),
+        'mcts': ('simulations', _bench_mcts),
+    }
+
+
+def run_suite(repeat=5, only=None, corpus_path=CORPUS):
+    """Runs every benchmark (or those named in only) repeat times and returns the results as a dict ready for JSON.
+    The repeats go round-robin through the benchmarks, so a stretch of time when the machine is busy slows one run
+    of each rather than every run of one, and each benchmark reports its best run as operations per second."""
+    corpus = load_corpus(corpus_path)
+    benchmarks = {name: entry for name, entry in suite(corpus).items() if not only or name in only}
+    best = {}
+    for _ in range(repeat):
+        for name, (unit, func) in benchmarks.items():
+            start = time.perf_counter()
+            outcome = func()
+            count, seconds = outcome if isinstance(outcome, tuple) else (outcome, time.perf_counter() - start)
+            if name not in best or count / seconds > best[name][0] / best[name][1]:
+                best[name] = (count, seconds)
+    results = {name: {'unit': unit, 'count': best[name][0], 'seconds': best[name][1],
+                      'per_second': best[name][0] / best[name][1]} for name, (unit, _) in benchmarks.items()}
+    return {'version': RESULTS_VERSION, 'python': platform.python_version(), 'machine': platform.machine(),
+            'repeat': repeat, 'benchmarks': results}
+
+
+def compare(baseline, current, threshold=0.1):
+    """Compares two run_suite results and returns [(name, baseline per second, current per second, change,
+    regressed)] for every benchmark in both. A benchmark regressed if it got slower by more than threshold (0.1 is
+    10%)."""
+    rows = []
+    for name, old in baseline['benchmarks'].items():
+        new = current['benchmarks'].get(name)
+        if new is None:
+            continue
+        change = new['per_second'] / old['per_second'] - 1
+        rows.append((name, old['per_second'], new['per_second'], change, change < -threshold))
+    return rows
+
+
+def main():
+    """Runs a benchmark from the command line"""
+    parser = argparse.ArgumentParser(description='Benchmarks for ChessVar')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='run the suite and write the results as JSON')
+    run.add_argument('--output', default=None, help='file to write (default: print the JSON)')
+    run.add_argument('--repeat', type=int, default=5)
+    run.add_argument('--only', nargs='+', default=None, help='names of the benchmarks to run')
+    run.add_argument('--corpus', default=CORPUS)
+    check = commands.add_parser('compare', help='flag regressions between two result files')
+    check.add_argument('baseline')
+    check.add_argument('current')
+    check.add_argument('--threshold', type=float, default=0.1, help='slowdown that counts as a regression')
+    corpus = commands.add_parser('corpus', help='regenerate the canned game corpus')
+    corpus.add_argument('--games', type=int, default=100)
+    corpus.add_argument('--seed', type=int, default=0)
+    corpus.add_argument('--output', default=CORPUS)
+    for name in ('memory', 'interleaved'):
+        command = commands.add_parser(name)
+        command.add_argument('--games', type=int, default=10000)
+        command.add_argument('--plies', type=int, default=40)
+        command.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run_suite(args.repeat, args.only, args.corpus)
+        for name, result in results['benchmarks'].items():
+            print('%-20s %12.0f %s/sec' % (name, result['per_second'], result['unit']), file=sys.stderr)
+        text = json.dumps(results, indent=2)
+        if args.output is None:
+            print(text)
+        else:
+            with open(args.output, 'w') as file:
+                file.write(text + '\n')
+    elif args.command == 'compare':
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        with open(args.current) as file:
+            current = json.load(file)
+        rows = compare(baseline, current, args.threshold)
+        for name, old, new, change, regressed in rows:
+            print('%-20s %12.0f -> %12.0f  %+6.1f%%%s' % (name, old, new, change * 100,
+                                                         '  REGRESSION' if regressed else ''))
+        if any(row[4] for row in rows):
+            sys.exit(1)
+    elif args.command == 'corpus':
+        write_corpus(args.output, args.games, args.seed)
+    elif args.command == 'memory':
+        per_game = bench_memory(args.games, args.plies, args.seed)
+        print('%.0f bytes per game after %d plies (%.1f MB per 100k games)' %
+              (per_game, args.plies, per_game * 100000 / 1024 / 1024))
+    else:
+        moves, seconds = bench_interleaved(args.games, args.plies, args.seed)
+        print('%d moves across %d games in %.2fs (%.0f moves/sec)' % (moves, args.games, seconds, moves / seconds))
+
+
+if __name__ == '__main__':
+    main()
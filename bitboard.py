@@ -0,0 +1,121 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Bitboard helpers for ChessVar. Squares are numbered 0-63 with a1 = 0, b1 = 1, ..., h8 = 63, so a
+# square's index is 8 * (rank - 1) + file. A bitboard is a Python int whose bit n is set when square n is in the set.
+# Attack tables for the king and knight are precomputed, and rooks and bishops use precomputed rays that are cut off
+# at the first blocker.
+
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_8 = RANK_1 << 56
+FULL = (1 << 64) - 1
+
+SQUARE_NAMES = tuple(file + rank for rank in '12345678' for file in 'abcdefgh')
+SQUARE_INDEX = {name: sq for sq, name in enumerate(SQUARE_NAMES)}
+BIT = tuple(1 << sq for sq in range(64))
+
+# Ray directions as (file step, rank step). The first four grow the square index, the last four shrink it.
+NORTH, EAST, NORTH_EAST, NORTH_WEST, SOUTH, WEST, SOUTH_WEST, SOUTH_EAST = range(8)
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1), (0, -1), (-1, 0), (-1, -1), (1, -1))
+ROOK_DIRECTIONS = (NORTH, EAST, SOUTH, WEST)
+BISHOP_DIRECTIONS = (NORTH_EAST, NORTH_WEST, SOUTH_WEST, SOUTH_EAST)
+
+
+def _offsets_mask(sq, offsets):
+    """Builds the mask of squares a fixed set of (file, rank) offsets reaches from sq"""
+    file, rank = sq & 7, sq >> 3
+    mask = 0
+    for df, dr in offsets:
+        f, r = file + df, rank + dr
+        if 0 <= f < 8 and 0 <= r < 8:
+            mask |= 1 << (8 * r + f)
+    return mask
+
+
+def _ray_mask(sq, direction):
+    """Builds the mask of squares from sq to the board edge in one direction, not including sq"""
+    df, dr = DIRECTIONS[direction]
+    f, r = (sq & 7) + df, (sq >> 3) + dr
+    mask = 0
+    while 0 <= f < 8 and 0 <= r < 8:
+        mask |= 1 << (8 * r + f)
+        f, r = f + df, r + dr
+    return mask
+
+
+KING_ATTACKS = tuple(_offsets_mask(sq, ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)))
+                     for sq in range(64))
+KNIGHT_ATTACKS = tuple(_offsets_mask(sq, ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)))
+                       for sq in range(64))
+RAYS = tuple(tuple(_ray_mask(sq, direction) for sq in range(64)) for direction in range(8))
+
+
+def lsb(bb):
+    """Returns the index of the lowest set bit of a non-empty bitboard"""
+    return (bb & -bb).bit_length() - 1
+
+
+def msb(bb):
+    """Returns the index of the highest set bit of a non-empty bitboard"""
+    return bb.bit_length() - 1
+
+
+def iter_bits(bb):
+    """Yields the index of every set bit, lowest first"""
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def _slide(sq, occupied, directions):
+    """Returns the squares a slider on sq reaches along the given rays, stopping at (and including) the first
+    occupied square"""
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][sq]
+        blockers = ray & occupied
+        if blockers:
+            # Positive directions are cut at the nearest blocker above sq, negative ones at the nearest below
+            if direction < 4:
+                ray ^= RAYS[direction][lsb(blockers)]
+            else:
+                ray ^= RAYS[direction][msb(blockers)]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    """Returns the squares a rook on sq attacks given the occupied squares"""
+    return _slide(sq, occupied, ROOK_DIRECTIONS)
+
+
+def bishop_attacks(sq, occupied):
+    """Returns the squares a bishop on sq attacks given the occupied squares"""
+    return _slide(sq, occupied, BISHOP_DIRECTIONS)
+
+
+def piece_attacks(piece, sq, occupied):
+    """Returns the squares the piece letter (either color) on sq attacks given the occupied squares"""
+    kind = piece.upper()
+    if kind == 'K':
+        return KING_ATTACKS[sq]
+    if kind == 'N':
+        return KNIGHT_ATTACKS[sq]
+    if kind == 'R':
+        return _slide(sq, occupied, ROOK_DIRECTIONS)
+    if kind == 'B':
+        return _slide(sq, occupied, BISHOP_DIRECTIONS)
+    return 0
+
+
+def pack_move(orig, dest):
+    """Packs a move into one integer: 6 bits of origin square above 6 bits of destination square"""
+    return orig << 6 | dest
+
+
+def unpack_move(move):
+    """Returns the (orig, dest) squares of a packed move"""
+    return move >> 6, move & 63
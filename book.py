@@ -0,0 +1,346 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Opening book for ChessVar. The book counts how often each move was played from each position in the
+# first plies of a set of games, and how those games ended for the player who made the move. It is kept in a file of
+# fixed 26-byte records (position hash, move, count, wins, losses, ties) sorted by hash and then move. OpeningBook
+# memory-maps the file and finds a position by binary search, so looking up a move costs a few microseconds however
+# big the book is. Books merge by streaming their sorted records together, so new games can be folded into a book
+# without going through the old ones again.
+
+import argparse
+import heapq
+import mmap
+import os
+import struct
+import time
+
+from ChessVar import ChessVar
+from archive import MAGIC as ARCHIVE_MAGIC
+from archive import ArchiveReader, decode_move, encode_move, unpack_position
+from selfplay import MAGIC as SHARD_MAGIC
+from selfplay import read_shard
+
+MAGIC = b'CVOB'
+VERSION = 1
+RECORD_BYTES = 26
+
+_FILE_HEADER = struct.Struct('<4sHHQ')
+_RECORD = struct.Struct('<QHIIII')
+_KEY = struct.Struct('<Q')
+_WIN_RESULTS = {'white': 'WHITE WINS', 'black': 'BLACK WINS'}
+_LOSS_RESULTS = {'white': 'BLACK WINS', 'black': 'WHITE WINS'}
+
+
+class BookMove:
+    """Class that holds the book statistics of one move from one position. Wins, losses and ties are counted for
+    the player who made the move; games that were never finished count towards the total only."""
+
+    def __init__(self, move, count, wins, losses, ties):
+        self._move = move
+        self._count = count
+        self._wins = wins
+        self._losses = losses
+        self._ties = ties
+
+    def get_move(self):
+        """Returns the move as a (fromsq, tosq) pair"""
+        return decode_move(self._move)
+
+    def get_packed_move(self):
+        """Returns the move packed as origin * 64 + destination"""
+        return self._move
+
+    def get_count(self):
+        """Returns how many games played the move"""
+        return self._count
+
+    def get_wins(self):
+        """Returns how many of those games the player making the move won"""
+        return self._wins
+
+    def get_losses(self):
+        """Returns how many of those games the player making the move lost"""
+        return self._losses
+
+    def get_ties(self):
+        """Returns how many of those games were ties"""
+        return self._ties
+
+    def get_score(self):
+        """Returns the average result of the move for the player making it, counting a tie as half a win, over the
+        games that finished. Returns 0.5 if none did."""
+        finished = self._wins + self._losses + self._ties
+        return (self._wins + self._ties / 2) / finished if finished else 0.5
+
+
+class BookBuilder:
+    """Class that collects move statistics from games and writes them out as a book file. Only the first
+    max_plies moves of each game are counted."""
+
+    def __init__(self, max_plies=20):
+        self._max_plies = max_plies
+        self._stats = {}
+        self._games = 0
+
+    def get_games(self):
+        """Returns how many games have been added"""
+        return self._games
+
+    def get_positions(self):
+        """Returns how many different (position, move) pairs have been counted"""
+        return len(self._stats)
+
+    def add_game(self, moves, result, start=None):
+        """Counts the moves of one game, given as packed integers or (fromsq, tosq) pairs and played from start (a
+        ChessVar, default the starting position, left unchanged), which ended in the game state result. Raises
+        ValueError at the first illegal move."""
+        game = ChessVar.from_position(start.to_position()) if start is not None else ChessVar()
+        self._add(game, (move if isinstance(move, int) else encode_move(*move) for move in moves), result)
+
+    def add_archive(self, path):
+        """Counts every game in a game archive file"""
+        with ArchiveReader(path) as reader:
+            for archived in reader:
+                self._add(unpack_position(archived.get_start_record()), archived.get_moves(), archived.get_result())
+
+    def add_shard(self, path):
+        """Counts every game in a self-play shard file. Raises ValueError at the first illegal move."""
+        start = game_result = None
+        moves = []
+        for position, move, result, ply in read_shard(path):
+            if ply == 0:
+                if start is not None:
+                    self._add(unpack_position(start), moves, game_result)
+                start, moves, game_result = position, [], result
+            if ply < self._max_plies:
+                moves.append(move)
+        if start is not None:
+            self._add(unpack_position(start), moves, game_result)
+
+    def _add(self, game, moves, result):
+        """Counts the first max_plies moves played from game, which is changed. A move played again from the same
+        position later in the game is only counted once, so counts stay counts of games."""
+        seen = set()
+        for ply, move in enumerate(moves):
+            if ply >= self._max_plies:
+                break
+            key, turn = game.get_hash(), game.get_turn()
+            reason = game.try_move_index(move >> 6, move & 63)
+            if reason is not None:
+                raise ValueError('move %d (%s%s) rejected: %s' % ((ply,) + decode_move(move) + (reason.name,)))
+            if (key, move) not in seen:
+                seen.add((key, move))
+                self._count(key, move, turn, result)
+        self._games += 1
+
+    def _count(self, key, move, turn, result):
+        """Adds one game's result to the statistics of move from the position with hash key"""
+        stats = self._stats.get((key, move))
+        if stats is None:
+            stats = self._stats[(key, move)] = [0, 0, 0, 0]
+        stats[0] += 1
+        if result == _WIN_RESULTS[turn]:
+            stats[1] += 1
+        elif result == _LOSS_RESULTS[turn]:
+            stats[2] += 1
+        elif result == 'TIE':
+            stats[3] += 1
+
+    def write(self, path):
+        """Writes the book file, sorted by position hash and then move"""
+        _write_records(path + '.tmp', self._games, ((key, move) + tuple(stats)
+                                                    for (key, move), stats in sorted(self._stats.items())))
+        os.replace(path + '.tmp', path)
+
+
+def _write_records(path, games, records):
+    """Writes a book file holding records, (key, move, count, wins, losses, ties) tuples already in sorted order,
+    gathered from games games. Returns how many records were written."""
+    written = 0
+    with open(path, 'wb') as file:
+        file.write(_FILE_HEADER.pack(MAGIC, VERSION, RECORD_BYTES, games))
+        for record in records:
+            file.write(_RECORD.pack(*record))
+            written += 1
+    return written
+
+
+def _read_header(mapped, path):
+    """Returns the number of games in a mapped book file. Raises ValueError if it is not a book."""
+    if len(mapped) < _FILE_HEADER.size:
+        raise ValueError('%s is not a version %d opening book' % (path, VERSION))
+    magic, version, record_bytes, games = _FILE_HEADER.unpack_from(mapped, 0)
+    if magic != MAGIC or version != VERSION or record_bytes != RECORD_BYTES or \
+            (len(mapped) - _FILE_HEADER.size) % RECORD_BYTES:
+        raise ValueError('%s is not a version %d opening book' % (path, VERSION))
+    return games
+
+
+def _iter_records(mapped):
+    """Yields every record of a mapped book file in order"""
+    for offset in range(_FILE_HEADER.size, len(mapped), RECORD_BYTES):
+        yield _RECORD.unpack_from(mapped, offset)
+
+
+def merge_books(output, paths):
+    """Merges the book files in paths into one book at output, adding up the statistics of every (position, move)
+    pair they share. The books are streamed, so memory use does not grow with their size. The merged book is
+    written next to output and only replaces it once complete, so output can be one of the inputs. Returns how many
+    records were written."""
+    files, maps = [], []
+    try:
+        games = 0
+        for path in paths:
+            files.append(open(path, 'rb'))
+            maps.append(mmap.mmap(files[-1].fileno(), 0, access=mmap.ACCESS_READ))
+            games += _read_header(maps[-1], path)
+
+        def summed():
+            current = None
+            for record in heapq.merge(*(_iter_records(mapped) for mapped in maps)):
+                if current is not None and record[:2] == current[:2]:
+                    current = current[:2] + tuple(a + b for a, b in zip(current[2:], record[2:]))
+                    continue
+                if current is not None:
+                    yield current
+                current = record
+            if current is not None:
+                yield current
+
+        written = _write_records(output + '.tmp', games, summed())
+    finally:
+        for mapped in maps:
+            mapped.close()
+        for file in files:
+            file.close()
+    os.replace(output + '.tmp', output)
+    return written
+
+
+class OpeningBook:
+    """Class that memory-maps a book file and looks up positions in it by binary search. Call close() or use it as a
+    context manager to release the file."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be mapped
+            self._file.close()
+            raise ValueError('%s is not a version %d opening book' % (path, VERSION)) from None
+        try:
+            self._games = _read_header(self._map, path)
+        except ValueError:
+            self.close()
+            raise
+        self._records = (len(self._map) - _FILE_HEADER.size) // RECORD_BYTES
+
+    def get_games(self):
+        """Returns how many games the book was built from"""
+        return self._games
+
+    def get_record_count(self):
+        """Returns how many (position, move) records the book holds"""
+        return self._records
+
+    def probe_hash(self, key):
+        """Returns a list of BookMove for the position with Zobrist hash key, most played first, or an empty list
+        if the book does not have the position"""
+        mapped = self._map
+        low, high = 0, self._records
+        while low < high:
+            middle = (low + high) // 2
+            if _KEY.unpack_from(mapped, _FILE_HEADER.size + middle * RECORD_BYTES)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        for offset in range(_FILE_HEADER.size + low * RECORD_BYTES, len(mapped), RECORD_BYTES):
+            record = _RECORD.unpack_from(mapped, offset)
+            if record[0] != key:
+                break
+            moves.append(BookMove(*record[1:]))
+        moves.sort(key=lambda entry: -entry.get_count())
+        return moves
+
+    def probe(self, game):
+        """Returns a list of BookMove for the position in game, most played first. Moves that are not legal in game,
+        which can only come from a hash collision, are left out."""
+        moves = self.probe_hash(game.get_hash())
+        if moves:
+            legal = set(game.legal_packed_moves())
+            moves = [entry for entry in moves if entry.get_packed_move() in legal]
+        return moves
+
+    def best_move(self, game, min_count=1):
+        """Returns the most played book move for game as a (fromsq, tosq) pair, the better score breaking ties, or
+        None if no move was played at least min_count times"""
+        moves = [entry for entry in self.probe(game) if entry.get_count() >= min_count]
+        if not moves:
+            return None
+        return max(moves, key=lambda entry: (entry.get_count(), entry.get_score())).get_move()
+
+    def close(self):
+        """Unmaps and closes the file"""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def build_book(output, paths, max_plies=20):
+    """Builds a book at output from game archives and self-play shards (told apart by their headers) and returns
+    the BookBuilder that collected it"""
+    builder = BookBuilder(max_plies)
+    for path in paths:
+        with open(path, 'rb') as file:
+            magic = file.read(4)
+        if magic == ARCHIVE_MAGIC:
+            builder.add_archive(path)
+        elif magic == SHARD_MAGIC:
+            builder.add_shard(path)
+        else:
+            raise ValueError('%s is neither a game archive nor a self-play shard' % path)
+    builder.write(output)
+    return builder
+
+
+def main():
+    """Builds, merges or looks up opening books from the command line"""
+    parser = argparse.ArgumentParser(description='Builds and reads ChessVar opening books')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='build a book from game archives and self-play shards')
+    build.add_argument('output')
+    build.add_argument('inputs', nargs='+')
+    build.add_argument('--max-plies', type=int, default=20, help='moves counted from the start of each game')
+    merge = commands.add_parser('merge', help='merge books into one')
+    merge.add_argument('output')
+    merge.add_argument('books', nargs='+')
+    probe = commands.add_parser('probe', help='list the book moves for a position')
+    probe.add_argument('book')
+    probe.add_argument('--position', default=ChessVar().to_position())
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        builder = build_book(args.output, args.inputs, args.max_plies)
+        print('%d games, %d records in %.1fs' % (builder.get_games(), builder.get_positions(),
+                                                 time.perf_counter() - start))
+    elif args.command == 'merge':
+        records = merge_books(args.output, args.books)
+        print('%d records written to %s' % (records, args.output))
+    else:
+        with OpeningBook(args.book) as book:
+            for entry in book.probe(ChessVar.from_position(args.position)):
+                print('%s%s %d games, +%d -%d =%d, score %.3f' % (entry.get_move() + (
+                    entry.get_count(), entry.get_wins(), entry.get_losses(), entry.get_ties(), entry.get_score())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Alpha-beta search engine for ChessVar. The engine deepens one ply at a time until it runs out of depth
+# or wall-clock time, orders king advances first, and keeps a transposition table between searches. Search runs in
+# place on the game using its move stack, so the game is left exactly as it was passed in. While the opponent thinks,
+# the engine can ponder: search the reply it expects in a background thread, and carry that search on if the reply
+# is what gets played.
+
+import math
+import threading
+import time
+
+from ChessVar import ChessVar
+from bitboard import SQUARE_INDEX, SQUARE_NAMES
+from transposition import EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable
+
+WIN = 100000
+_WIN_BOUND = WIN - 1000
+_RANK_VALUE = 100
+# Nodes between clock reads. A node costs around 100us, so this keeps overruns to a few milliseconds.
+_CHECK_EVERY = 32
+
+
+class _Timeout(Exception):
+    """Raised inside the search when the time budget runs out"""
+
+
+class SearchResult:
+    """Class that holds the outcome of one search: the best move, its score for the player to move, the principal
+    variation and how much work was done"""
+
+    def __init__(self, move, score, depth, pv, nodes, seconds):
+        self._move = move
+        self._score = score
+        self._depth = depth
+        self._pv = pv
+        self._nodes = nodes
+        self._seconds = seconds
+
+    def get_move(self):
+        """Returns the best move as a (fromsq, tosq) pair, or None if there is no legal move"""
+        return self._move
+
+    def get_score(self):
+        """Returns the score of the best move in centi-ranks for the player to move. Scores beyond +/-99000
+        are forced wins or losses."""
+        return self._score
+
+    def get_depth(self):
+        """Returns the deepest fully completed iteration"""
+        return self._depth
+
+    def get_pv(self):
+        """Returns the principal variation as a list of (fromsq, tosq) pairs"""
+        return self._pv
+
+    def get_nodes(self):
+        """Returns how many positions were searched"""
+        return self._nodes
+
+    def get_time_ms(self):
+        """Returns how long the search took in milliseconds"""
+        return self._seconds * 1000
+
+    def get_nps(self):
+        """Returns positions searched per second"""
+        return int(self._nodes / self._seconds) if self._seconds > 0 else 0
+
+
+class Engine:
+    """Class that searches ChessVar positions with iterative deepening alpha-beta and a transposition table that
+    is kept from one search to the next. With a Tablebase, positions it covers are scored exactly instead of
+    searched. With an OpeningBook, positions it has a move for are not searched at all."""
+
+    def __init__(self, tt_size_mb=16, tablebase=None, book=None):
+        self._tt = TranspositionTable(tt_size_mb)
+        self._tablebase = tablebase
+        self._book = book
+        self._nodes = 0
+        self._deadline = None
+        self._max_depth = 0
+        self._depth_done = 0
+        self._pv = []
+        self._last_pv = []
+        self._ponder_thread = None
+        self._ponder_key = None
+        self._ponder_result = None
+        self._ponder_hits = 0
+        self._ponder_misses = 0
+
+    def get_table(self):
+        """Returns the engine's transposition table"""
+        return self._tt
+
+    def get_ponder_hits(self):
+        """Returns how many searches carried on from a ponder on the move that was actually played"""
+        return self._ponder_hits
+
+    def get_ponder_misses(self):
+        """Returns how many ponders were thrown away because the opponent played something else"""
+        return self._ponder_misses
+
+    def is_pondering(self):
+        """Returns True while a ponder is running or waiting to be picked up by best_move"""
+        return self._ponder_thread is not None
+
+    def best_move(self, game, time_ms=1000, max_depth=64):
+        """Searches the position in game for at most time_ms milliseconds and max_depth plies and returns a
+        SearchResult. The game is left unchanged. A book move is returned straight away, with depth 0 and score 0.
+        If the engine is pondering this very position, the ponder search carries on until time_ms milliseconds
+        from now or max_depth, and its result, counting the work done while pondering, is returned. A ponder
+        that already went deeper than max_depth returns its deeper result. Any other ponder is stopped first, and
+        waiting for it counts against time_ms."""
+        start = time.perf_counter()
+        deadline = start + time_ms / 1000
+        if self._book is not None:
+            move = self._book.best_move(game)
+            if move is not None:
+                self.stop_pondering()
+                self._last_pv = [move]
+                return SearchResult(move, 0, 0, [move], 0, time.perf_counter() - start)
+        if self._ponder_thread is not None:
+            if game.get_hash() == self._ponder_key:
+                # Ponder hit: give the running search the real deadline and depth limit and let it finish
+                self._max_depth = max_depth
+                self._deadline = deadline if self._depth_done < max_depth else 0
+                self._ponder_hits += 1
+                return self._collect_ponder()
+            self._ponder_misses += 1
+            self.stop_pondering()
+        self._deadline = deadline
+        return self._search(game, start, max_depth)
+
+    def ponder(self, game, predicted=None, max_depth=64):
+        """Starts searching, in a background thread, the position the opponent's predicted reply would reach from
+        game, where the opponent is to move. predicted is a (fromsq, tosq) pair and defaults to the reply in the
+        principal variation of the last search, or else the first move in search order. The search shares the
+        transposition table and runs until best_move or stop_pondering is called. Returns the predicted move, or
+        None if the opponent has no legal move. Raises ValueError if predicted is not legal in game."""
+        self.stop_pondering()
+        if predicted is None:
+            predicted = self._predict(game)
+            if predicted is None:
+                return None
+        position = ChessVar.from_position(game.to_position())
+        position.set_rejection_hook(None)
+        reason = position.try_move(*predicted)
+        if reason is not None:
+            raise ValueError('%s%s is not a legal reply: %s' % (predicted[0], predicted[1], reason.name))
+        self._ponder_key = position.get_hash()
+        self._ponder_result = None
+        self._deadline = math.inf
+        self._ponder_thread = threading.Thread(target=self._run_ponder, args=(position, max_depth), daemon=True)
+        self._ponder_thread.start()
+        return predicted
+
+    def stop_pondering(self):
+        """Stops any running ponder and returns its SearchResult, or None if the engine was not pondering. What
+        it stored in the transposition table stays there for later searches."""
+        if self._ponder_thread is None:
+            return None
+        self._deadline = 0
+        return self._collect_ponder()
+
+    def _collect_ponder(self):
+        """Waits for the ponder thread to finish and returns its result"""
+        self._ponder_thread.join()
+        self._ponder_thread = None
+        self._ponder_key = None
+        result, self._ponder_result = self._ponder_result, None
+        return result
+
+    def _run_ponder(self, position, max_depth):
+        """Body of the ponder thread"""
+        self._ponder_result = self._search(position, time.perf_counter(), max_depth)
+
+    def _predict(self, game):
+        """Returns the opponent's expected reply in game as a (fromsq, tosq) pair, or None if it has none"""
+        if len(self._last_pv) >= 2:
+            fromsq, tosq = self._last_pv[1]
+            move = (SQUARE_INDEX[fromsq] << 6) | SQUARE_INDEX[tosq]
+            if move in game.legal_packed_moves():
+                return self._last_pv[1]
+        moves = self._ordered_moves(game, 0)
+        if not moves:
+            return None
+        return SQUARE_NAMES[moves[0] >> 6], SQUARE_NAMES[moves[0] & 63]
+
+    def _search(self, game, start, max_depth):
+        """Deepens the search of game one ply at a time until self._deadline passes or max_depth is done and
+        returns a SearchResult timed from start"""
+        self._nodes = 0
+        self._tt.new_search()
+
+        root_moves = self._ordered_moves(game, 0)
+        if not root_moves:
+            return SearchResult(None, self._evaluate(game, 0), 0, [], 0, time.perf_counter() - start)
+        best, score, depth, pv = root_moves[0], 0, 0, [root_moves[0]]
+        # A ponder hit can lower the depth limit of a running search, so it is read afresh every iteration
+        self._max_depth = max_depth
+        self._depth_done = 0
+        iteration = 0
+        while iteration < self._max_depth:
+            iteration += 1
+            self._pv = [[] for _ in range(iteration + 2)]
+            try:
+                score = self._root(game, iteration, root_moves)
+            except _Timeout:
+                break
+            pv = self._pv[0]
+            best, depth = pv[0], iteration
+            self._depth_done = iteration
+            # Search the previous best move first next time
+            root_moves.remove(best)
+            root_moves.insert(0, best)
+            if abs(score) >= _WIN_BOUND:
+                break
+
+        self._last_pv = [(SQUARE_NAMES[move >> 6], SQUARE_NAMES[move & 63]) for move in pv]
+        return SearchResult((SQUARE_NAMES[best >> 6], SQUARE_NAMES[best & 63]), score, depth, self._last_pv,
+                            self._nodes, time.perf_counter() - start)
+
+    def _root(self, game, depth, moves):
+        """Searches every root move to depth and returns the best score"""
+        alpha, beta = -WIN - 1, WIN + 1
+        best = moves[0]
+        for move in moves:
+            if time.perf_counter() > self._deadline:
+                raise _Timeout
+            game._play(move >> 6, move & 63)
+            try:
+                score = -self._negamax(game, depth - 1, -beta, -alpha, 1)
+            finally:
+                game.undo_move()
+            if score > alpha:
+                alpha, best = score, move
+                self._pv[0] = [move] + self._pv[1]
+        self._tt.store(game.get_hash(), depth, alpha, EXACT, best)
+        return alpha
+
+    def _negamax(self, game, depth, alpha, beta, ply):
+        """Returns the score of the position for the player to move, searched depth more plies"""
+        self._nodes += 1
+        if self._nodes % _CHECK_EVERY == 0 and time.perf_counter() > self._deadline:
+            raise _Timeout
+        self._pv[ply] = []
+
+        state = game.get_game_state()
+        if state != 'UNFINISHED':
+            return self._evaluate(game, ply)
+        if game.get_near_win():
+            # Black has exactly one move left after white reached row 8, so settle it instead of guessing
+            return self._resolve_near_win(game, ply)
+        if self._tablebase is not None:
+            found = self._tablebase.probe(game)
+            if found is not None:
+                return _tablebase_score(found, game.get_turn(), ply)
+        if depth <= 0:
+            return self._evaluate(game, ply)
+
+        key = game.get_hash()
+        entry = self._tt.probe(key)
+        tt_move = 0
+        if entry is not None:
+            stored_depth, score, bound, tt_move = entry
+            if stored_depth >= depth:
+                score = _from_table(score, ply)
+                if bound == EXACT or (bound == LOWER_BOUND and score >= beta) or \
+                        (bound == UPPER_BOUND and score <= alpha):
+                    return score
+
+        original_alpha = alpha
+        best_score, best_move = -WIN - 1, 0
+        moves = self._ordered_moves(game, tt_move)
+        if not moves:
+            # _play leaves a player with no legal move to the search to find. With the row 8 race settled above,
+            # being stuck is a tie.
+            return 0
+        for move in moves:
+            game._play(move >> 6, move & 63)
+            try:
+                score = -self._negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.undo_move()
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    self._pv[ply] = [move] + self._pv[ply + 1]
+                    if alpha >= beta:
+                        break
+
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self._tt.store(key, depth, _to_table(best_score, ply), bound, best_move)
+        return best_score
+
+    def _ordered_moves(self, game, tt_move):
+        """Returns the legal moves packed as from * 64 + to, with the table move first, then king moves that
+        advance the furthest, then captures, then everything else"""
+        board = game.get_board()
+        scored = []
+        for move in game.legal_packed_moves():
+            orig, dest = move >> 6, move & 63
+            piece = board[orig]
+            if move == tt_move:
+                order = 1000
+            elif (piece == 'K' or piece == 'k') and dest >> 3 > orig >> 3:
+                order = 100 + 10 * ((dest >> 3) - (orig >> 3))
+            elif board[dest] != ' ':
+                order = 50
+            else:
+                order = 0
+            scored.append((order, move))
+        scored.sort(reverse=True)
+        return [move for _, move in scored]
+
+    def _resolve_near_win(self, game, ply):
+        """Scores a position where white has reached row 8 and black has its last move: a tie if the black king
+        can legally reach row 8 too, otherwise a white win"""
+        board = game.get_board()
+        for move in game.legal_packed_moves():
+            if board[move >> 6] == 'k' and move & 63 >= 56:
+                return 0
+        # Black is to move here, so a white win is a loss for the player to move
+        return -(WIN - ply)
+
+    def _evaluate(self, game, ply):
+        """Scores the position for the player to move. Finished games score as wins, losses or 0 for a tie.
+        Otherwise each rank the player's king is ahead in the race is worth 100, and the player to move gets
+        half a rank for having the tempo."""
+        state = game.get_game_state()
+        white = game.get_turn() == 'white'
+        if state == 'TIE':
+            return 0
+        if state == 'WHITE WINS':
+            return WIN - ply if white else -(WIN - ply)
+        if state == 'BLACK WINS':
+            return -(WIN - ply) if white else WIN - ply
+        white_rank = int(game.wKingLoc[1])
+        black_rank = int(game.bKingLoc[1])
+        score = _RANK_VALUE * (white_rank - black_rank)
+        return (score if white else -score) + _RANK_VALUE // 2
+
+
+def _to_table(score, ply):
+    """Converts a win or loss score measured from this ply into one measured from the stored position"""
+    if score >= _WIN_BOUND:
+        return score + ply
+    if score <= -_WIN_BOUND:
+        return score - ply
+    return score
+
+
+def _from_table(score, ply):
+    """Converts a stored win or loss score back into one measured from this ply"""
+    if score >= _WIN_BOUND:
+        return score - ply
+    if score <= -_WIN_BOUND:
+        return score + ply
+    return score
+
+
+def _tablebase_score(found, turn, ply):
+    """Converts a (result, distance) tablebase entry into a score for the player to move"""
+    result, distance = found
+    if result == 'TIE':
+        return 0
+    score = WIN - (ply + distance)
+    return score if (result == 'WHITE WINS') == (turn == 'white') else -score
+
+
+def best_move(game, time_ms=1000, max_depth=64):
+    """Searches game with a fresh Engine and returns a SearchResult"""
+    return Engine().best_move(game, time_ms, max_depth)
@@ -0,0 +1,228 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Opt-in profiling for ChessVar and the engines built on it. enable() swaps timing and counting wrappers
+# in for the methods on the move path, and disable() puts the originals back, so nothing is measured and nothing
+# costs anything while profiling is off. Time is split into phases and each phase counts only its own time, not the
+# time of other phases it calls. The results can be read as a dict or exported in the Prometheus text format.
+
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import ChessVar as chessvar_module
+from ChessVar import ChessVar
+from engine import Engine
+from mcts import MCTS
+
+# Phase each wrapped ChessVar method's time is charged to
+_METHOD_PHASES = {
+    'try_move': 'input_checks',
+    'try_move_index': 'input_checks',
+    'king_legal': 'piece_tests',
+    'rook_legal': 'piece_tests',
+    'bishop_legal': 'piece_tests',
+    'knight_legal': 'piece_tests',
+    'wcheck_checker': 'check_detection',
+    'bcheck_checker': 'check_detection',
+    '_keeps_kings_safe': 'check_detection',
+    '_play': 'board_update',
+    'undo_move': 'board_update',
+    '_has_legal_move': 'game_end_check',
+}
+# Attack helpers ChessVar calls as module functions, all charged to piece_tests
+_FUNCTIONS = ('piece_attacks', 'rook_attacks', 'bishop_attacks')
+
+_active = None
+_originals = []
+
+
+class Metrics:
+    """Class that collects counters and per-phase timers while profiling is enabled"""
+
+    def __init__(self):
+        self._counters = Counter()
+        self._rejections = Counter()
+        self._seconds = defaultdict(float)
+        self._calls = Counter()
+        self._search_nodes = Counter()
+        self._search_seconds = defaultdict(float)
+        self._local = threading.local()
+
+    def record_search(self, nodes, seconds, engine='alphabeta'):
+        """Adds one search of nodes positions taking seconds to the totals for engine"""
+        self._search_nodes[engine] += nodes
+        self._search_seconds[engine] += seconds
+
+    def get_nodes_per_second(self, engine='alphabeta'):
+        """Returns the positions searched per second across every search recorded for engine"""
+        seconds = self._search_seconds[engine]
+        return self._search_nodes[engine] / seconds if seconds > 0 else 0.0
+
+    def reset(self):
+        """Sets every counter and timer back to zero"""
+        for totals in (self._counters, self._rejections, self._seconds, self._calls, self._search_nodes,
+                       self._search_seconds):
+            totals.clear()
+
+    def as_dict(self):
+        """Returns a snapshot of everything collected as plain dicts and numbers"""
+        return {
+            'moves_attempted': self._counters['moves_attempted'],
+            'moves_accepted': self._counters['moves_accepted'],
+            'moves_rejected': dict(self._rejections),
+            'check_detection_calls': self._calls['check_detection'],
+            'squares_scanned': self._counters['squares_scanned'],
+            'phase_seconds': dict(self._seconds),
+            'phase_calls': dict(self._calls),
+            'search_nodes': dict(self._search_nodes),
+            'search_seconds': dict(self._search_seconds),
+            'nodes_per_second': {engine: self.get_nodes_per_second(engine) for engine in self._search_nodes},
+        }
+
+    def to_prometheus(self, prefix='chessvar'):
+        """Returns everything collected in the Prometheus text exposition format"""
+        lines = []
+
+        def metric(name, kind, samples):
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+            for labels, value in samples:
+                label_text = ','.join('%s="%s"' % label for label in labels)
+                lines.append('%s_%s%s %s' % (prefix, name, '{%s}' % label_text if label_text else '', repr(value)))
+
+        metric('moves_attempted_total', 'counter', [((), self._counters['moves_attempted'])])
+        metric('moves_accepted_total', 'counter', [((), self._counters['moves_accepted'])])
+        metric('moves_rejected_total', 'counter',
+               [((('reason', reason),), count) for reason, count in sorted(self._rejections.items())])
+        metric('squares_scanned_total', 'counter', [((), self._counters['squares_scanned'])])
+        metric('phase_seconds_total', 'counter',
+               [((('phase', phase),), seconds) for phase, seconds in sorted(self._seconds.items())])
+        metric('phase_calls_total', 'counter',
+               [((('phase', phase),), calls) for phase, calls in sorted(self._calls.items())])
+        metric('search_nodes_total', 'counter',
+               [((('engine', engine),), nodes) for engine, nodes in sorted(self._search_nodes.items())])
+        metric('search_nodes_per_second', 'gauge',
+               [((('engine', engine),), self.get_nodes_per_second(engine)) for engine in sorted(self._search_nodes)])
+        return '\n'.join(lines) + '\n'
+
+    def _timed(self, phase, func):
+        """Returns func wrapped to charge its own time to phase. Time spent in other wrapped calls inside it is
+        charged to their phases instead."""
+        local = self._local
+        seconds = self._seconds
+        calls = self._calls
+
+        def wrapper(*args, **kwargs):
+            stack = local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                seconds[phase] += elapsed - stack.pop()
+                calls[phase] += 1
+                if stack:
+                    stack[-1] += elapsed
+        wrapper.__wrapped__ = func
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+
+    def _counted_move(self, func):
+        """Returns try_move or try_move_index wrapped to count the move and its outcome, once per move even
+        though try_move calls try_move_index"""
+        local = self._local
+        counters = self._counters
+        rejections = self._rejections
+
+        def wrapper(*args, **kwargs):
+            if getattr(local, 'in_move', False):
+                return func(*args, **kwargs)
+            local.in_move = True
+            try:
+                reason = func(*args, **kwargs)
+            finally:
+                local.in_move = False
+            counters['moves_attempted'] += 1
+            if reason is None:
+                counters['moves_accepted'] += 1
+            else:
+                rejections[reason.name] += 1
+            return reason
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def _scanning(self, func):
+        """Returns an attack helper wrapped to count the squares in every attack set it returns"""
+        counters = self._counters
+
+        def wrapper(*args):
+            attacks = func(*args)
+            counters['squares_scanned'] += bin(attacks).count('1')
+            return attacks
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def _searching(self, func, engine):
+        """Returns a best_move method wrapped to record its nodes and time"""
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            if engine == 'mcts':
+                self.record_search(result.get_simulations(), result.get_time_ms() / 1000, engine)
+            else:
+                self.record_search(result.get_nodes(), result.get_time_ms() / 1000, engine)
+            return result
+        wrapper.__wrapped__ = func
+        return wrapper
+
+
+def _patch(owner, name, replacement):
+    """Replaces an attribute and remembers the original for disable()"""
+    _originals.append((owner, name, getattr(owner, name)))
+    setattr(owner, name, replacement)
+
+
+def enable(metrics=None):
+    """Starts profiling every ChessVar, Engine and MCTS in this process and returns the Metrics being filled in
+    (a new one unless metrics is given). Raises RuntimeError if profiling is already on."""
+    global _active
+    if _active is not None:
+        raise RuntimeError('profiling is already enabled')
+    _active = metrics if metrics is not None else Metrics()
+    for name, phase in _METHOD_PHASES.items():
+        method = _active._timed(phase, getattr(ChessVar, name))
+        if name in ('try_move', 'try_move_index'):
+            method = _active._counted_move(method)
+        _patch(ChessVar, name, method)
+    for name in _FUNCTIONS:
+        _patch(chessvar_module, name, _active._timed('piece_tests', _active._scanning(getattr(chessvar_module, name))))
+    _patch(Engine, 'best_move', _active._searching(Engine.best_move, 'alphabeta'))
+    _patch(MCTS, 'best_move', _active._searching(MCTS.best_move, 'mcts'))
+    return _active
+
+
+def disable():
+    """Stops profiling and puts every original method back. Returns the Metrics that was being filled in, or None
+    if profiling was off."""
+    global _active
+    while _originals:
+        owner, name, original = _originals.pop()
+        setattr(owner, name, original)
+    metrics, _active = _active, None
+    return metrics
+
+
+def is_enabled():
+    """Returns True while profiling is on"""
+    return _active is not None
+
+
+@contextmanager
+def profiling(metrics=None):
+    """Enables profiling for the duration of a with block and hands out the Metrics being filled in"""
+    metrics = enable(metrics)
+    try:
+        yield metrics
+    finally:
+        disable()
@@ -0,0 +1,254 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Monte Carlo tree search player for ChessVar. Each simulation walks down the tree by UCT, adds one new
+# position and plays it out with random moves until get_game_state() reports a result. Rollouts are sent to worker
+# processes in batches, with a virtual loss on every path still waiting for its result, so the search keeps every
+# worker busy while paying for one round trip per batch instead of one per rollout.
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import time
+from collections import deque
+
+from ChessVar import ChessVar
+from bitboard import SQUARE_NAMES
+
+ROLLOUT_LIMIT = 300
+_REWARDS = {'WHITE WINS': 1.0, 'BLACK WINS': 0.0, 'TIE': 0.5}
+_GREED = 0.5
+
+
+def pick_move(game, rng, policy='heuristic'):
+    """Returns a legal move for the player to move, packed as origin * 64 + destination, or None once the game is
+    over. The 'heuristic' policy always takes a king move onto row 8 and otherwise plays the king move that
+    advances furthest half the time. The 'random' policy picks every move uniformly."""
+    moves = list(game.legal_packed_moves())
+    if not moves:
+        return None
+    if policy == 'heuristic':
+        king = game.get_bitboard('K' if game.get_turn() == 'white' else 'k').bit_length() - 1
+        move = None
+        best_gain = 0
+        for candidate in moves:
+            if candidate >> 6 == king and (candidate & 63) >> 3 > (king >> 3) + best_gain:
+                move, best_gain = candidate, ((candidate & 63) >> 3) - (king >> 3)
+        if move is not None and ((move & 63) >= 56 or rng.random() < _GREED):
+            return move
+    return moves[rng.randrange(len(moves))]
+
+
+def rollout(game, rng, policy='heuristic', limit=ROLLOUT_LIMIT):
+    """Plays game out with moves from pick_move and returns the result for white: 1 for a white win, 0 for a black
+    win and 0.5 for a tie or if limit plies pass first"""
+    for _ in range(limit):
+        move = pick_move(game, rng, policy)
+        if move is None:
+            if game.get_game_state() == 'UNFINISHED':
+                # _play does not end the game for a player with no legal move, which only wins for white when
+                # black still had to answer white reaching row 8
+                return 1.0 if game.get_near_win() else 0.5
+            break
+        game._play(move >> 6, move & 63)
+    return _REWARDS.get(game.get_game_state(), 0.5)
+
+
+def _rollout_batch(task):
+    """Plays out a batch of positions in a worker process and returns white's result for each"""
+    positions, seed, policy = task
+    rng = random.Random(seed)
+    return [rollout(ChessVar.from_position(position), rng, policy) for position in positions]
+
+
+class _Node:
+    """One position in the search tree. value is the total result from the view of the player who moved into it."""
+    __slots__ = ('move', 'children', 'untried', 'visits', 'value', 'white')
+
+    def __init__(self, move, white, untried):
+        self.move = move
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.value = 0.0
+        self.white = white
+
+
+class MCTSResult:
+    """Class that holds the outcome of one search: the chosen move, how it scored and how many simulations ran"""
+
+    def __init__(self, move, win_rate, visits, simulations, seconds):
+        self._move = move
+        self._win_rate = win_rate
+        self._visits = visits
+        self._simulations = simulations
+        self._seconds = seconds
+
+    def get_move(self):
+        """Returns the most visited move as a (fromsq, tosq) pair, or None if there is no legal move"""
+        return self._move
+
+    def get_win_rate(self):
+        """Returns the average result of the chosen move for the player to move, counting a tie as half a win. A
+        move no simulation went through scores 0.5."""
+        return self._win_rate
+
+    def get_visits(self):
+        """Returns how many simulations went through the chosen move"""
+        return self._visits
+
+    def get_simulations(self):
+        """Returns how many simulations ran"""
+        return self._simulations
+
+    def get_time_ms(self):
+        """Returns how long the search took in milliseconds"""
+        return self._seconds * 1000
+
+    def get_sims_per_second(self):
+        """Returns simulations completed per second"""
+        return int(self._simulations / self._seconds) if self._seconds > 0 else 0
+
+
+class MCTS:
+    """Class that chooses moves by Monte Carlo tree search. workers is the number of rollout processes (default: one
+    per CPU, 1 runs rollouts in this process) and batch_size the number of rollouts sent to a worker at once. Call
+    close() or use it as a context manager to shut the workers down."""
+
+    def __init__(self, workers=None, batch_size=32, exploration=1.4, policy='heuristic', seed=None):
+        if policy not in ('heuristic', 'random'):
+            raise ValueError("policy must be 'heuristic' or 'random'")
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self._workers = workers
+        self._batch_size = batch_size
+        self._exploration = exploration
+        self._policy = policy
+        self._rng = random.Random(seed)
+        self._pool = multiprocessing.Pool(workers) if workers > 1 else None
+
+    def best_move(self, game, time_ms=1000, max_simulations=None):
+        """Searches the position in game for about time_ms milliseconds, or until max_simulations have been
+        started, and returns an MCTSResult. Batches already sent out are waited for, so the search can run over by
+        one batch per worker. The game is left unchanged."""
+        start = time.perf_counter()
+        deadline = start + time_ms / 1000
+        root = _Node(None, game.get_turn() == 'black', list(game.legal_packed_moves()))
+        if not root.untried:
+            return MCTSResult(None, _REWARDS.get(game.get_game_state(), 0.5), 0, 0, time.perf_counter() - start)
+
+        in_flight = 1 if self._pool is None else 2 * self._workers
+        pending = deque()
+        started = simulations = 0
+        while True:
+            while len(pending) < in_flight and time.perf_counter() < deadline and \
+                    (max_simulations is None or started < max_simulations):
+                paths, positions = [], []
+                for _ in range(self._batch_size):
+                    if max_simulations is not None and started >= max_simulations:
+                        break
+                    started += 1
+                    path, position, reward = self._descend(game, root)
+                    if position is None:
+                        # The new leaf is already a finished game, so its result needs no rollout
+                        self._backpropagate(path, reward)
+                        simulations += 1
+                    else:
+                        paths.append(path)
+                        positions.append(position)
+                if not positions:
+                    continue
+                task = (positions, self._rng.getrandbits(64), self._policy)
+                if self._pool is None:
+                    pending.append((paths, _rollout_batch(task)))
+                else:
+                    pending.append((paths, self._pool.apply_async(_rollout_batch, (task,))))
+            if not pending:
+                break
+            paths, results = pending.popleft()
+            if self._pool is not None:
+                results = results.get()
+            for path, reward in zip(paths, results):
+                self._backpropagate(path, reward)
+            simulations += len(paths)
+
+        if not root.children:
+            # No simulation started, so fall back to the first legal move, unscored
+            move = root.untried[0]
+            return MCTSResult((SQUARE_NAMES[move >> 6], SQUARE_NAMES[move & 63]), 0.5, 0, simulations,
+                              time.perf_counter() - start)
+        best = max(root.children, key=lambda child: child.visits)
+        return MCTSResult((SQUARE_NAMES[best.move >> 6], SQUARE_NAMES[best.move & 63]), best.value / best.visits,
+                          best.visits, simulations, time.perf_counter() - start)
+
+    def _descend(self, game, root):
+        """Selects a path by UCT, expands one new child at its end and counts a visit on every node of the path
+        (a virtual loss until the result comes back). Returns the path, the new leaf's position string (None if
+        the game is over there) and, for a finished game, its result for white."""
+        node = root
+        path = [root]
+        played = 0
+        while not node.untried and node.children:
+            scale = self._exploration * math.sqrt(math.log(node.visits))
+            node = max(node.children, key=lambda child: child.value / child.visits +
+                       scale / math.sqrt(child.visits))
+            game.try_move_index(node.move >> 6, node.move & 63)
+            path.append(node)
+            played += 1
+        if node.untried:
+            move = node.untried.pop(self._rng.randrange(len(node.untried)))
+            game.try_move_index(move >> 6, move & 63)
+            child = _Node(move, game.get_turn() == 'black', list(game.legal_packed_moves()))
+            node.children.append(child)
+            path.append(child)
+            played += 1
+
+        state = game.get_game_state()
+        position = game.to_position() if state == 'UNFINISHED' else None
+        for _ in range(played):
+            game.undo_move()
+        for node in path:
+            node.visits += 1
+        return path, position, _REWARDS.get(state)
+
+    def _backpropagate(self, path, reward):
+        """Adds white's result of one simulation to every node on its path, from the view of the player who moved
+        into each node"""
+        for node in path:
+            node.value += reward if node.white else 1 - reward
+
+    def close(self):
+        """Shuts down the worker processes"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    """Searches a position from the command line and reports simulations per second"""
+    parser = argparse.ArgumentParser(description='Monte Carlo tree search for ChessVar')
+    parser.add_argument('--position', default=ChessVar().to_position())
+    parser.add_argument('--time', type=int, default=2000, help='time budget in milliseconds')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch', type=int, default=32)
+    parser.add_argument('--policy', choices=('heuristic', 'random'), default='heuristic')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    with MCTS(args.workers, args.batch, policy=args.policy, seed=args.seed) as player:
+        result = player.best_move(ChessVar.from_position(args.position), args.time)
+    print('%s%s win rate %.3f (%d visits), %d simulations in %.0fms (%d sims/sec)' %
+          (result.get_move() + (result.get_win_rate(), result.get_visits(), result.get_simulations(),
+                                result.get_time_ms(), result.get_sims_per_second())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Bulk validation of recorded ChessVar games. replay_games replays each game (a list of (fromsq, tosq)
+# pairs) in a pool of worker processes and yields one ReplayResult per game in input order. Games are pulled from
+# the input in chunks only as workers free up, so a generator over a huge archive is never loaded all at once.
+
+import itertools
+import multiprocessing
+import os
+from collections import deque
+
+from ChessVar import ChessVar
+
+
+class ReplayResult:
+    """Class that holds the outcome of replaying one game: its position in the input, the final game state and the
+    index of the first move that was rejected and why, if any"""
+
+    def __init__(self, index, game_state, first_illegal, moves_played, rejection=None):
+        self._index = index
+        self._game_state = game_state
+        self._first_illegal = first_illegal
+        self._moves_played = moves_played
+        self._rejection = rejection
+
+    def get_index(self):
+        """Returns the position of the game in the input, starting at 0"""
+        return self._index
+
+    def get_game_state(self):
+        """Returns get_game_state() of the game after the last accepted move"""
+        return self._game_state
+
+    def get_first_illegal(self):
+        """Returns the index of the first rejected move, or None if every move was accepted"""
+        return self._first_illegal
+
+    def get_rejection(self):
+        """Returns the Rejection for the first rejected move, or None if every move was accepted"""
+        return self._rejection
+
+    def get_moves_played(self):
+        """Returns how many moves were accepted"""
+        return self._moves_played
+
+    def is_valid(self):
+        """Returns True if every move in the game was accepted"""
+        return self._first_illegal is None
+
+
+def replay_game(moves):
+    """Replays one game and returns (game state, index of the first rejected move or None, moves accepted,
+    Rejection or None)"""
+    game = ChessVar()
+    for played, (fromsq, tosq) in enumerate(moves):
+        reason = game.try_move(fromsq, tosq)
+        if reason is not None:
+            return game.get_game_state(), played, played, reason
+    return game.get_game_state(), None, len(moves), None
+
+
+def _replay_chunk(chunk):
+    """Replays a list of games in a worker process"""
+    return [replay_game(moves) for moves in chunk]
+
+
+def replay_games(games, workers=None, chunksize=64):
+    """Replays every game from the iterable games, each a sequence of (fromsq, tosq) pairs, and yields a
+    ReplayResult for each in input order. workers is the number of processes (default: one per CPU, 1 replays in
+    this process). At most two chunks of chunksize games per worker are in flight at any time."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    games = iter(games)
+    index = 0
+    if workers <= 1:
+        for chunk in iter(lambda: list(itertools.islice(games, chunksize)), []):
+            for result in _replay_chunk(chunk):
+                yield ReplayResult(index, *result)
+                index += 1
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < 2 * workers:
+                chunk = list(itertools.islice(games, chunksize))
+                if not chunk:
+                    exhausted = True
+                    break
+                pending.append(pool.apply_async(_replay_chunk, (chunk,)))
+            if not pending:
+                return
+            for result in pending.popleft().get():
+                yield ReplayResult(index, *result)
+                index += 1
@@ -0,0 +1,227 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Self-play training data for ChessVar. generate() plays games in worker processes and streams one
+# fixed 18-byte record per position (the position, the move played from it, the game's final result and the ply the
+# move was played at) to sharded output files. Finished games pass through a bounded queue to a single writer, so a
+# worker waits whenever the writer falls behind and memory stays flat however many games are generated.
+
+import argparse
+import mmap
+import multiprocessing
+import os
+import queue
+import random
+import struct
+import time
+
+from ChessVar import ChessVar
+from archive import GAME_STATES, POSITION_BYTES, pack_position
+from bitboard import SQUARE_INDEX, pack_move
+from engine import Engine
+from mcts import pick_move
+
+RECORD_BYTES = 18
+MAGIC = b'CVSP'
+VERSION = 2
+POLICIES = ('random', 'heuristic', 'engine')
+
+_FILE_HEADER = struct.Struct('<4sHH')
+_RECORD = struct.Struct('<%dsHBH' % POSITION_BYTES)
+_STATE_CODES = {state: code for code, state in enumerate(GAME_STATES)}
+
+
+class SelfPlayStats:
+    """Class that holds what one generate() run produced and how fast"""
+
+    def __init__(self, games, positions, seconds, paths):
+        self._games = games
+        self._positions = positions
+        self._seconds = seconds
+        self._paths = paths
+
+    def get_games(self):
+        """Returns how many games were played"""
+        return self._games
+
+    def get_positions(self):
+        """Returns how many position records were written"""
+        return self._positions
+
+    def get_seconds(self):
+        """Returns how long the run took in seconds"""
+        return self._seconds
+
+    def get_games_per_second(self):
+        """Returns games played per second"""
+        return self._games / self._seconds if self._seconds > 0 else 0.0
+
+    def get_positions_per_second(self):
+        """Returns position records written per second"""
+        return self._positions / self._seconds if self._seconds > 0 else 0.0
+
+    def get_paths(self):
+        """Returns the shard files written, in order"""
+        return self._paths
+
+
+def play_game(rng, policy='heuristic', depth=3, random_plies=4, max_plies=300, engine=None):
+    """Plays one game from the starting position and returns (records, number of records). The first random_plies
+    moves are random so games differ, and the rest come from policy: 'random' or 'heuristic' (see mcts.pick_move),
+    or 'engine' for a depth-limited alpha-beta search with engine. A game cut off after max_plies records the result
+    'UNFINISHED'."""
+    game = ChessVar()
+    positions = []
+    moves = []
+    while game.get_game_state() == 'UNFINISHED' and len(moves) < max_plies:
+        if policy == 'engine' and len(moves) >= random_plies:
+            fromsq, tosq = engine.best_move(game, 3600000, depth).get_move()
+            move = pack_move(SQUARE_INDEX[fromsq], SQUARE_INDEX[tosq])
+        else:
+            move = pick_move(game, rng, 'random' if len(moves) < random_plies else policy)
+        positions.append(pack_position(game))
+        moves.append(move)
+        game.try_move_index(move >> 6, move & 63)
+    result = _STATE_CODES[game.get_game_state()]
+    return b''.join(_RECORD.pack(position, move, result, ply)
+                    for ply, (position, move) in enumerate(zip(positions, moves))), len(moves)
+
+
+def _game_rng(seed, index):
+    """Returns the random number generator for game index, which does not depend on how games are split up"""
+    return random.Random('%d:%d' % (seed, index))
+
+
+def _play_games(worker, workers, games, seed, options, output):
+    """Plays every workers-th game starting at game worker and puts each onto output, then None when done"""
+    engine = Engine(1) if options[0] == 'engine' else None
+    for index in range(worker, games, workers):
+        if engine is not None:
+            engine.get_table().clear()
+        output.put(play_game(_game_rng(seed, index), *options, engine=engine))
+    output.put(None)
+
+
+class _ShardWriter:
+    """Writes records to numbered shard files, starting a new one before a game would take a shard past
+    shard_records records"""
+
+    def __init__(self, directory, prefix, shard_records):
+        self._directory = directory
+        self._prefix = prefix
+        self._shard_records = shard_records
+        self._file = None
+        self._count = 0
+        self._paths = []
+
+    def write(self, records, count):
+        """Appends count records of one game, starting a new shard first if they would overfill this one"""
+        if self._file is None or (self._count and self._count + count > self._shard_records):
+            self.close()
+            path = os.path.join(self._directory, '%s-%05d.bin' % (self._prefix, len(self._paths)))
+            self._file = open(path, 'wb')
+            self._file.write(_FILE_HEADER.pack(MAGIC, VERSION, RECORD_BYTES))
+            self._paths.append(path)
+            self._count = 0
+        self._file.write(records)
+        self._count += count
+
+    def get_paths(self):
+        """Returns the shard files started so far, in order"""
+        return self._paths
+
+    def close(self):
+        """Closes the shard being written, if any"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def generate(directory, games, workers=None, policy='heuristic', depth=3, random_plies=4, max_plies=300, seed=0,
+             shard_records=1 << 20, queue_size=64, prefix='selfplay'):
+    """Plays games self-play games across workers processes (default: one per CPU, 1 plays in this process) and
+    writes their records to shard files in directory. At most queue_size finished games wait for the writer at any
+    time. Game n is played from the same random seed however the games are split up, so its records are the same;
+    with several workers, games are written in the order they finish. Returns a SelfPlayStats."""
+    if policy not in POLICIES:
+        raise ValueError('policy must be one of %s' % ', '.join(POLICIES))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    os.makedirs(directory, exist_ok=True)
+    options = (policy, depth, random_plies, max_plies)
+    writer = _ShardWriter(directory, prefix, shard_records)
+    positions = 0
+    start = time.perf_counter()
+    try:
+        if workers <= 1:
+            engine = Engine(1) if policy == 'engine' else None
+            for index in range(games):
+                if engine is not None:
+                    engine.get_table().clear()
+                records, count = play_game(_game_rng(seed, index), *options, engine=engine)
+                writer.write(records, count)
+                positions += count
+            return SelfPlayStats(games, positions, time.perf_counter() - start, writer.get_paths())
+
+        output = multiprocessing.Queue(queue_size)
+        processes = [multiprocessing.Process(target=_play_games, args=(worker, workers, games, seed, options, output),
+                                             daemon=True) for worker in range(workers)]
+        for process in processes:
+            process.start()
+        finished = 0
+        while finished < workers:
+            try:
+                item = output.get(timeout=1)
+            except queue.Empty:
+                if any(process.exitcode not in (None, 0) for process in processes):
+                    raise RuntimeError('a self-play worker process failed')
+                continue
+            if item is None:
+                finished += 1
+                continue
+            writer.write(*item)
+            positions += item[1]
+        for process in processes:
+            process.join()
+        return SelfPlayStats(games, positions, time.perf_counter() - start, writer.get_paths())
+    finally:
+        writer.close()
+
+
+def read_shard(path):
+    """Yields (position record, move, result, ply) for every record in a shard file, reading it through a memory
+    map. The position record is the 13-byte archive.pack_position record, move is packed as origin * 64 +
+    destination, result is the game's final get_game_state() and ply counts the moves played before this one, so
+    a game starts at every record with ply 0"""
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, record_bytes = _FILE_HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC or version != VERSION or record_bytes != RECORD_BYTES:
+                raise ValueError('%s is not a version %d self-play shard' % (path, VERSION))
+            for offset in range(_FILE_HEADER.size, len(mapped), RECORD_BYTES):
+                position, move, result, ply = _RECORD.unpack_from(mapped, offset)
+                yield position, move, GAME_STATES[result], ply
+
+
+def main():
+    """Generates self-play data from the command line and reports its throughput"""
+    parser = argparse.ArgumentParser(description='Generates ChessVar self-play training data')
+    parser.add_argument('directory')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--policy', choices=POLICIES, default='heuristic')
+    parser.add_argument('--depth', type=int, default=3, help='search depth for the engine policy')
+    parser.add_argument('--random-plies', type=int, default=4)
+    parser.add_argument('--max-plies', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shard-records', type=int, default=1 << 20)
+    args = parser.parse_args()
+    stats = generate(args.directory, args.games, args.workers, args.policy, args.depth, args.random_plies,
+                     args.max_plies, args.seed, args.shard_records)
+    print('%d games, %d positions in %.1fs (%.1f games/sec, %.0f positions/sec) across %d shards' %
+          (stats.get_games(), stats.get_positions(), stats.get_seconds(), stats.get_games_per_second(),
+           stats.get_positions_per_second(), len(stats.get_paths())))
+
+
+if __name__ == '__main__':
+    main()
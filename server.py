@@ -0,0 +1,288 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: asyncio TCP server that hosts many ChessVar games in one event loop, and a load generator for it.
+# Clients send one JSON object per line and get one JSON object back per line, in order:
+#   {"op": "new_game"}                                      -> {"ok": true, "session": "...", "state": ..., "turn": ...}
+#   {"op": "make_move", "session": s, "from": "c2", "to": "e3"} -> {"ok": true, "accepted": true, "state": ..., ...}
+#   {"op": "get_game_state", "session": s}                  -> {"ok": true, "state": ..., "turn": ..., "position": ...}
+#   {"op": "close_game", "session": s}                      -> {"ok": true}
+# A request may carry an "id", which is echoed back. Errors come back as {"ok": false, "error": "..."}. The server
+# only binds loopback addresses.
+
+import argparse
+import asyncio
+import ipaddress
+import json
+import random
+import secrets
+import time
+from collections import OrderedDict
+
+from ChessVar import ChessVar
+from bitboard import SQUARE_NAMES
+from mcts import pick_move
+
+MAX_LINE_BYTES = 4096
+
+
+class _Session:
+    """One hosted game and when it was last used"""
+    __slots__ = ('game', 'last_used')
+
+    def __init__(self):
+        self.game = ChessVar()
+        self.game.set_rejection_hook(None)
+        self.last_used = time.monotonic()
+
+
+class GameServer:
+    """Class that serves ChessVar games over line-delimited JSON. Sessions are independent of connections, so a
+    client can reconnect and carry on with a session id. Every request on a session runs to completion before the
+    next one starts, since game calls never wait on anything, so requests on one session apply one at a time in the
+    order they arrive. Each connection is answered in order and is not read again until its last answer has been
+    taken up by the client, which keeps a slow reader from piling up replies. Sessions unused for idle_timeout
+    seconds are dropped."""
+
+    def __init__(self, host='127.0.0.1', port=0, idle_timeout=300, max_sessions=100000, max_connections=10000):
+        if host != 'localhost' and not ipaddress.ip_address(host).is_loopback:
+            raise ValueError('the game server only binds loopback addresses, not %s' % host)
+        self._host = host
+        self._port = port
+        self._idle_timeout = idle_timeout
+        self._max_sessions = max_sessions
+        self._max_connections = max_connections
+        # Least recently used first, so idle sessions can be evicted from the front
+        self._sessions = OrderedDict()
+        self._connections = 0
+        self._server = None
+        self._evictor = None
+
+    async def start(self):
+        """Starts listening and evicting idle sessions"""
+        self._server = await asyncio.start_server(self._handle, self._host, self._port, limit=MAX_LINE_BYTES)
+        self._port = self._server.sockets[0].getsockname()[1]
+        self._evictor = asyncio.create_task(self._evict_idle())
+
+    async def serve_forever(self):
+        """Starts the server if needed and serves until cancelled"""
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        """Stops listening and evicting"""
+        self._evictor.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def get_port(self):
+        """Returns the port the server listens on"""
+        return self._port
+
+    def get_session_count(self):
+        """Returns how many sessions are open"""
+        return len(self._sessions)
+
+    def get_connection_count(self):
+        """Returns how many clients are connected"""
+        return self._connections
+
+    async def _handle(self, reader, writer):
+        """Answers the requests on one connection in order"""
+        if self._connections >= self._max_connections:
+            writer.write(b'{"ok": false, "error": "too many connections"}\n')
+            writer.close()
+            return
+        self._connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(b'{"ok": false, "error": "request line too long"}\n')
+                    break
+                if not line:
+                    break
+                writer.write(json.dumps(self._respond(line)).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._connections -= 1
+            writer.close()
+
+    def _respond(self, line):
+        """Returns the reply to one request line"""
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'ok': False, 'error': 'request is not valid JSON'}
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': 'request must be a JSON object'}
+        reply = self._dispatch(request)
+        if 'id' in request:
+            reply['id'] = request['id']
+        return reply
+
+    def _dispatch(self, request):
+        """Carries out one request and returns the reply"""
+        op = request.get('op')
+        if op == 'new_game':
+            if len(self._sessions) >= self._max_sessions:
+                return {'ok': False, 'error': 'server is full'}
+            session_id = secrets.token_hex(8)
+            session = _Session()
+            self._sessions[session_id] = session
+            return {'ok': True, 'session': session_id, 'state': session.game.get_game_state(),
+                    'turn': session.game.get_turn()}
+        if op not in ('make_move', 'get_game_state', 'close_game'):
+            return {'ok': False, 'error': 'unknown op %r' % op}
+
+        session_id = request.get('session')
+        session = self._sessions.get(session_id) if isinstance(session_id, str) else None
+        if session is None:
+            return {'ok': False, 'error': 'no such session'}
+        if op == 'close_game':
+            del self._sessions[session_id]
+            return {'ok': True}
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        game = session.game
+        if op == 'get_game_state':
+            return {'ok': True, 'state': game.get_game_state(), 'turn': game.get_turn(),
+                    'position': game.to_position()}
+        fromsq, tosq = request.get('from'), request.get('to')
+        if not isinstance(fromsq, str) or not isinstance(tosq, str):
+            return {'ok': False, 'error': 'make_move needs "from" and "to" squares'}
+        reason = game.try_move(fromsq, tosq)
+        reply = {'ok': True, 'accepted': reason is None, 'state': game.get_game_state(), 'turn': game.get_turn()}
+        if reason is not None:
+            reply['reason'] = reason.name
+        return reply
+
+    async def _evict_idle(self):
+        """Drops sessions that have not been used for idle_timeout seconds"""
+        while True:
+            await asyncio.sleep(min(self._idle_timeout / 4, 60))
+            cutoff = time.monotonic() - self._idle_timeout
+            while self._sessions:
+                session_id, session = next(iter(self._sessions.items()))
+                if session.last_used >= cutoff:
+                    break
+                del self._sessions[session_id]
+
+
+class LoadReport:
+    """Class that holds the move latencies one load run measured"""
+
+    def __init__(self, latencies, seconds, games):
+        self._latencies = sorted(latencies)
+        self._seconds = seconds
+        self._games = games
+
+    def get_games(self):
+        """Returns how many games were played"""
+        return self._games
+
+    def get_moves(self):
+        """Returns how many moves were made"""
+        return len(self._latencies)
+
+    def get_seconds(self):
+        """Returns how long the run took in seconds"""
+        return self._seconds
+
+    def get_moves_per_second(self):
+        """Returns moves made per second across all clients"""
+        return len(self._latencies) / self._seconds if self._seconds > 0 else 0.0
+
+    def get_latency_ms(self, percentile):
+        """Returns the make_move round trip time in milliseconds at a percentile from 0 to 100"""
+        if not self._latencies:
+            return 0.0
+        rank = min(len(self._latencies) - 1, int(percentile / 100 * len(self._latencies)))
+        return self._latencies[rank] * 1000
+
+
+async def _call(reader, writer, request):
+    """Sends one request and returns the reply"""
+    writer.write(json.dumps(request).encode() + b'\n')
+    await writer.drain()
+    reply = json.loads(await reader.readline())
+    if not reply.get('ok'):
+        raise RuntimeError('server refused %s: %s' % (request['op'], reply.get('error')))
+    return reply
+
+
+async def _play_client(host, port, client, games, seed, max_plies, latencies):
+    """Plays games games one after another on one connection, timing every make_move"""
+    rng = random.Random('%d:%d' % (seed, client))
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE_BYTES)
+    try:
+        for _ in range(games):
+            session = (await _call(reader, writer, {'op': 'new_game'}))['session']
+            # A local copy of the game picks the moves, so the client only measures the server
+            local = ChessVar()
+            for _ in range(max_plies):
+                move = pick_move(local, rng)
+                if move is None:
+                    break
+                request = {'op': 'make_move', 'session': session, 'from': SQUARE_NAMES[move >> 6],
+                           'to': SQUARE_NAMES[move & 63]}
+                start = time.perf_counter()
+                reply = await _call(reader, writer, request)
+                latencies.append(time.perf_counter() - start)
+                if not reply['accepted']:
+                    raise RuntimeError('server rejected a legal move: %s' % reply.get('reason'))
+                local.make_packed_move(move)
+            await _call(reader, writer, {'op': 'close_game', 'session': session})
+    finally:
+        writer.close()
+
+
+async def run_load(host='127.0.0.1', port=None, clients=100, games=5, seed=0, max_plies=300):
+    """Connects clients clients at once, each playing games games with heuristic moves, and returns a LoadReport.
+    With no port, a GameServer is started in this event loop for the run."""
+    server = None
+    if port is None:
+        server = GameServer(host)
+        await server.start()
+        port = server.get_port()
+    latencies = []
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(_play_client(host, port, client, games, seed, max_plies, latencies)
+                               for client in range(clients)))
+    finally:
+        if server is not None:
+            await server.close()
+    return LoadReport(latencies, time.perf_counter() - start, clients * games)
+
+
+def main():
+    """Runs the server or the load generator from the command line"""
+    parser = argparse.ArgumentParser(description='ChessVar game server and load generator')
+    parser.add_argument('command', choices=('serve', 'load'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None, help='serve: default 8765; load: default starts a server')
+    parser.add_argument('--idle-timeout', type=float, default=300)
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--games', type=int, default=5, help='games per client')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.command == 'serve':
+        server = GameServer(args.host, 8765 if args.port is None else args.port, args.idle_timeout)
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        return
+    report = asyncio.run(run_load(args.host, args.port, args.clients, args.games, args.seed))
+    print('%d games, %d moves in %.2fs (%.0f moves/sec), move latency p50 %.2fms p99 %.2fms' %
+          (report.get_games(), report.get_moves(), report.get_seconds(), report.get_moves_per_second(),
+           report.get_latency_ms(50), report.get_latency_ms(99)))
+
+
+if __name__ == '__main__':
+    main()
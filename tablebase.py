@@ -0,0 +1,370 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Endgame tablebases for ChessVar built by retrograde analysis. A table covers one set of pieces (the two
+# kings plus a few others) and holds the result of every position with those pieces under perfect play, together with
+# the number of plies until the game ends. Tables are built smallest first, because a capture leads into a smaller
+# table, and the move generation for each table is split across a pool of worker processes. Each table is a file of
+# 16-bit entries that Tablebase memory-maps and indexes straight from a ChessVar position.
+
+import itertools
+import mmap
+import multiprocessing
+import os
+import struct
+from array import array
+
+from bitboard import BIT, iter_bits, piece_attacks
+
+MAGIC = b'CVTB'
+VERSION = 1
+EXTENSION = '.cvtb'
+
+# Result codes stored in the low 2 bits of an entry, in the same order as the move stack's game states. Code 0 marks
+# a position that cannot come up in a game. The other 14 bits hold the distance in plies to the end of the game,
+# which is 0 for ties.
+RESULTS = ('UNFINISHED', 'TIE', 'BLACK WINS', 'WHITE WINS')
+_TIE, _BLACK_WINS, _WHITE_WINS = 1, 2, 3
+_NORMAL = 4
+
+_HEADER = struct.Struct('<4sHH12s')
+_PIECE_ORDER = 'KRBNkrbn'
+_CHUNK = 4096
+
+
+def piece_sets(max_pieces=3):
+    """Returns every set of pieces with both kings and at most max_pieces pieces in all, smallest first. A set is
+    written like 'KRkn': white's pieces, then black's, each in the order king, rook, bishop, knight."""
+    sets = set()
+    for count in range(max_pieces - 1):
+        for extra in itertools.combinations('RBBNNrbbnn', count):
+            sets.add('K' + ''.join(p for p in extra if p.isupper()) + 'k' + ''.join(p for p in extra if p.islower()))
+    return sorted(sets, key=lambda pieces: (len(pieces), pieces))
+
+
+def table_path(directory, pieces):
+    """Returns the path of the table for a set of pieces"""
+    return os.path.join(directory, pieces + EXTENSION)
+
+
+def _index(squares, black):
+    """Returns the table index of a position: the piece squares as base-64 digits, then the side to move"""
+    index = 0
+    for sq in squares:
+        index = index << 6 | sq
+    return index << 1 | black
+
+
+def _occupied(squares):
+    """Returns the bitboard of the squares holding a piece. A square of -1 is a captured piece."""
+    occupied = 0
+    for sq in squares:
+        if sq >= 0:
+            occupied |= BIT[sq]
+    return occupied
+
+
+def _kings_safe(pieces, squares, black_king):
+    """Returns True if neither king is attacked. White's pieces come before black's, which start with the black
+    king at slot black_king."""
+    occupied = _occupied(squares)
+    white_target = BIT[squares[0]]
+    black_target = BIT[squares[black_king]]
+    for slot, sq in enumerate(squares):
+        if sq >= 0 and piece_attacks(pieces[slot], sq, occupied) & (black_target if slot < black_king else
+                                                                    white_target):
+            return False
+    return True
+
+
+def _classify(pieces, squares, black, black_king):
+    """Returns None for a position that cannot come up, a result code if the game is already over, or _NORMAL.
+    Whether white has already reached row 8 follows from where its king is, so it is not part of the position."""
+    if len(set(squares)) < len(squares) or not _kings_safe(pieces, squares, black_king):
+        return None
+    white_home = squares[0] >= 56
+    black_home = squares[black_king] >= 56
+    if black:
+        # Black reaching row 8 ends the game at once, so black is never to move with its king there
+        return None if black_home else _NORMAL
+    if black_home:
+        return _TIE if white_home else _BLACK_WINS
+    if white_home:
+        return _WHITE_WINS
+    return _NORMAL
+
+
+_open_tables = {}
+
+
+def _load(path):
+    """Returns the entries of a table file as a memoryview, keeping one mapping per file in each process"""
+    if path not in _open_tables:
+        with open(path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        _open_tables[path] = memoryview(mapped)[_HEADER.size:].cast('H')
+    return _open_tables[path]
+
+
+def _analyse_chunk(task):
+    """Classifies the positions with indices start to stop - 1 of the table for pieces in a worker process. For
+    each one it returns its kind (0 if it cannot come up, a result code if the game is over, _NORMAL otherwise),
+    how many of its moves stay in the table, the best and worst results of its captures (looked up in the
+    smaller tables) and the indices of the positions one move before it."""
+    directory, pieces, start, stop = task
+    black_king = pieces.index('k')
+    count = len(pieces)
+    kinds = array('B')
+    moves = array('H')
+    capture_wins = array('H')
+    capture_losses = array('H')
+    pred_counts = array('H')
+    preds = array('I')
+
+    for index in range(start, stop):
+        black = index & 1
+        code = index >> 1
+        squares = [0] * count
+        for slot in range(count - 1, -1, -1):
+            squares[slot] = code & 63
+            code >>= 6
+        kind = _classify(pieces, squares, black, black_king)
+        kinds.append(kind or 0)
+        moves.append(0)
+        capture_wins.append(0)
+        capture_losses.append(0)
+        pred_counts.append(0)
+        if kind is None:
+            continue
+
+        occupied = _occupied(squares)
+        if kind == _NORMAL:
+            white = not black
+            own = [slot for slot in range(count) if pieces[slot].isupper() == white]
+            own_bb = _occupied([squares[slot] for slot in own])
+            enemy_king = BIT[squares[black_king if white else 0]]
+            at = {sq: slot for slot, sq in enumerate(squares)}
+            in_table = 0
+            any_move = keeps_hope = False
+            best_win = worst_loss = 0
+            for slot in own:
+                orig = squares[slot]
+                for dest in iter_bits(piece_attacks(pieces[slot], orig, occupied) & ~own_bb & ~enemy_king):
+                    captured = at.get(dest)
+                    squares[slot] = dest
+                    if captured is not None:
+                        squares[captured] = -1
+                    if _kings_safe(pieces, squares, black_king):
+                        any_move = True
+                        if captured is None:
+                            in_table += 1
+                        else:
+                            rest = [sq for sq in squares if sq >= 0]
+                            entry = _load(table_path(directory, pieces[:captured] + pieces[captured + 1:]))[
+                                _index(rest, not black)]
+                            result, distance = entry & 3, (entry >> 2) + 1
+                            if result == _TIE:
+                                keeps_hope = True
+                            elif (result == _WHITE_WINS) == white:
+                                keeps_hope = True
+                                best_win = min(best_win, distance) if best_win else distance
+                            else:
+                                worst_loss = max(worst_loss, distance)
+                    if captured is not None:
+                        squares[captured] = dest
+                    squares[slot] = orig
+            if not any_move:
+                # A player with no legal move cannot go on, which only helps white when black still had to answer
+                kind = _WHITE_WINS if black and squares[0] >= 56 else _TIE
+                kinds[-1] = kind
+            else:
+                # A capture that wins or ties means the position can never be lost, so it counts as one move that
+                # is never knocked out
+                moves[-1] = in_table + keeps_hope
+                capture_wins[-1] = best_win
+                capture_losses[-1] = worst_loss
+
+        # Positions one move earlier: the player not to move here takes back a non-capture with one of its pieces
+        mover_was_white = bool(black)
+        found = 0
+        for slot in range(count):
+            if pieces[slot].isupper() != mover_was_white:
+                continue
+            dest = squares[slot]
+            for orig in iter_bits(piece_attacks(pieces[slot], dest, occupied) & ~occupied):
+                squares[slot] = orig
+                if _classify(pieces, squares, not black, black_king) == _NORMAL:
+                    preds.append(_index(squares, not black))
+                    found += 1
+            squares[slot] = dest
+        pred_counts[-1] = found
+    return kinds, moves, capture_wins, capture_losses, pred_counts, preds
+
+
+def build_table(directory, pieces, pool=None):
+    """Builds the table for one set of pieces and writes it to directory. Every table one capture smaller must
+    already be there. pool is a multiprocessing pool to spread the move generation over, or None to do it all in
+    this process. Returns the path written."""
+    size = 2 << 6 * len(pieces)
+    entries = array('H', bytes(2 * size))
+    moves = array('H')
+    losses = array('H')
+    pred_start = array('I', [0])
+    preds = array('I')
+    playing = bytearray(size)
+    buckets = {}
+
+    tasks = [(directory, pieces, start, min(start + _CHUNK, size)) for start in range(0, size, _CHUNK)]
+    chunks = pool.imap(_analyse_chunk, tasks) if pool is not None else map(_analyse_chunk, tasks)
+    index = 0
+    for kinds, chunk_moves, capture_wins, capture_losses, pred_counts, chunk_preds in chunks:
+        moves.extend(chunk_moves)
+        losses.extend(capture_losses)
+        preds.extend(chunk_preds)
+        for i, kind in enumerate(kinds):
+            pred_start.append(pred_start[-1] + pred_counts[i])
+            if kind == _NORMAL:
+                playing[index] = 1
+                white = not index & 1
+                if capture_wins[i]:
+                    buckets.setdefault(capture_wins[i], []).append((index, _WHITE_WINS if white else _BLACK_WINS))
+                if chunk_moves[i] == 0:
+                    buckets.setdefault(capture_losses[i], []).append((index, _BLACK_WINS if white else _WHITE_WINS))
+            elif kind:
+                buckets.setdefault(0, []).append((index, kind))
+            index += 1
+
+    # Settle positions in order of distance, so a win is found by its shortest route and a loss by its longest
+    distance = 0
+    while buckets:
+        for index, result in buckets.pop(distance, ()):
+            if entries[index]:
+                continue
+            entries[index] = result | distance << 2
+            if result == _TIE:
+                continue
+            # The player who moved into this position is the one not to move here
+            earlier_wins = (result == _WHITE_WINS) == bool(index & 1)
+            for pred in preds[pred_start[index]:pred_start[index + 1]]:
+                if entries[pred]:
+                    continue
+                if earlier_wins:
+                    buckets.setdefault(distance + 1, []).append((pred, result))
+                    continue
+                losses[pred] = max(losses[pred], distance + 1)
+                moves[pred] -= 1
+                if moves[pred] == 0:
+                    buckets.setdefault(losses[pred], []).append((pred, result))
+        distance += 1
+
+    # Whatever is still open can be held forever by at least one side, so the game never ends and nobody wins
+    for index in range(size):
+        if playing[index] and not entries[index]:
+            entries[index] = _TIE
+
+    path = table_path(directory, pieces)
+    with open(path + '.tmp', 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, len(pieces), pieces.encode()))
+        file.write(entries.tobytes())
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def build_tablebases(directory, max_pieces=3, workers=None):
+    """Builds the tables for every set of pieces with at most max_pieces pieces (see piece_sets) into directory,
+    smallest first. workers is the number of processes (default: one per CPU, 1 builds in this process). Tables with
+    four or more pieces take a long time. Returns the paths written."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    os.makedirs(directory, exist_ok=True)
+    # Forget tables mapped by an earlier build in this process, since they may be about to be replaced
+    _open_tables.clear()
+    if workers <= 1:
+        return [build_table(directory, pieces) for pieces in piece_sets(max_pieces)]
+    with multiprocessing.Pool(workers) as pool:
+        return [build_table(directory, pieces, pool) for pieces in piece_sets(max_pieces)]
+
+
+class Tablebase:
+    """Class that memory-maps the tables in a directory and looks positions up in them"""
+
+    def __init__(self, directory):
+        self._tables = {}
+        self._files = []
+        self._max_pieces = 0
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(EXTENSION):
+                continue
+            file = open(os.path.join(directory, name), 'rb')
+            self._files.append(file)
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count, pieces = _HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC or version != VERSION:
+                mapped.close()
+                self.close()
+                raise ValueError('%s is not a version %d ChessVar tablebase' % (name, VERSION))
+            self._tables[pieces.rstrip(b'\0').decode()] = (mapped, memoryview(mapped)[_HEADER.size:].cast('H'))
+            self._max_pieces = max(self._max_pieces, count)
+
+    def get_piece_sets(self):
+        """Returns the sets of pieces there are tables for"""
+        return sorted(self._tables, key=lambda pieces: (len(pieces), pieces))
+
+    def get_max_pieces(self):
+        """Returns the most pieces any table covers"""
+        return self._max_pieces
+
+    def probe(self, game):
+        """Returns (result, distance) for the position in game under perfect play from both sides, where result
+        is 'TIE', 'BLACK WINS' or 'WHITE WINS' and distance is how many plies the game lasts (0 for a tie). Returns
+        None if there is no table for the pieces on the board or the position cannot come up in a game."""
+        bitboards = [game.get_bitboard(piece) for piece in _PIECE_ORDER]
+        if sum(bin(bb).count('1') for bb in bitboards) > self._max_pieces:
+            return None
+        material = ''
+        index = 0
+        for piece, bb in zip(_PIECE_ORDER, bitboards):
+            for sq in iter_bits(bb):
+                material += piece
+                index = index << 6 | sq
+        table = self._tables.get(material)
+        if table is None:
+            return None
+        entry = table[1][index << 1 | (game.get_turn() == 'black')]
+        if not entry:
+            return None
+        return RESULTS[entry & 3], entry >> 2
+
+    def close(self):
+        """Unmaps and closes every table"""
+        for mapped, view in self._tables.values():
+            view.release()
+            mapped.close()
+        for file in self._files:
+            file.close()
+        self._tables = {}
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    """Builds tablebases from the command line"""
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description='Builds ChessVar endgame tablebases by retrograde analysis')
+    parser.add_argument('directory')
+    parser.add_argument('--max-pieces', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    paths = build_tablebases(args.directory, args.max_pieces, args.workers)
+    print('built %d tables in %.1fs' % (len(paths), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Fixed-size transposition table keyed by ChessVar Zobrist hashes. Entries live in two flat arrays of
+# 64-bit integers (key and packed data), so the table never grows past the memory budget it was created with.
+# Each key maps to a bucket of two slots: the first keeps the deepest result from the current search, the second
+# always takes the newest result.
+
+from array import array
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+ENTRY_BYTES = 16
+_SCORE_OFFSET = 1 << 31
+
+
+class TranspositionTable:
+    """Class that stores search results (depth, score, bound type and best move) by position hash within a fixed
+    memory budget"""
+
+    def __init__(self, size_mb=16):
+        buckets = max(1, (size_mb * 1024 * 1024) // (2 * ENTRY_BYTES))
+        self._buckets = buckets
+        self._keys = array('Q', bytes(16 * buckets))
+        self._data = array('Q', bytes(16 * buckets))
+        self._generation = 0
+
+    def get_size(self):
+        """Returns how many entries the table can hold"""
+        return 2 * self._buckets
+
+    def get_fill(self):
+        """Returns how many entries are in use"""
+        return sum(1 for data in self._data if data)
+
+    def clear(self):
+        """Empties the table"""
+        self._keys = array('Q', bytes(16 * self._buckets))
+        self._data = array('Q', bytes(16 * self._buckets))
+        self._generation = 0
+
+    def new_search(self):
+        """Marks the start of a new search so entries from earlier ones can be replaced first"""
+        self._generation = (self._generation + 1) & 0xFF
+
+    def probe(self, key):
+        """Returns (depth, score, bound, move) stored for the position hash key, or None. move is a packed
+        from * 64 + to integer, or 0 if no move was stored."""
+        slot = 2 * (key % self._buckets)
+        keys = self._keys
+        if keys[slot] == key and self._data[slot]:
+            data = self._data[slot]
+        elif keys[slot + 1] == key and self._data[slot + 1]:
+            data = self._data[slot + 1]
+        else:
+            return None
+        return (data >> 14) & 0xFF, (data >> 30) - _SCORE_OFFSET, (data >> 12) & 3, data & 0xFFF
+
+    def store(self, key, depth, score, bound, move=0):
+        """Stores a search result for the position hash key. The first slot of the bucket is only overwritten by
+        the same position, a search at least as deep, or a result from a newer search."""
+        slot = 2 * (key % self._buckets)
+        data = ((score + _SCORE_OFFSET) << 30) | (self._generation << 22) | (min(depth, 0xFF) << 14) | \
+            (bound << 12) | move
+        old = self._data[slot]
+        if not old or self._keys[slot] == key or depth >= (old >> 14) & 0xFF or \
+                (old >> 22) & 0xFF != self._generation:
+            if old and self._keys[slot] != key:
+                # Keep the displaced result around in the always-replace slot
+                self._keys[slot + 1] = self._keys[slot]
+                self._data[slot + 1] = old
+            self._keys[slot] = key
+            self._data[slot] = data
+        else:
+            self._keys[slot + 1] = key
+            self._data[slot + 1] = data
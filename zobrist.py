@@ -0,0 +1,28 @@
+# Author: Brenden Covington
+# GitHub username: covingtb
+# Date: 10/18/2026
+# Description: Zobrist keys for hashing ChessVar positions. A position's hash is the XOR of one key per piece on its
+# square, a key when black is to move, and a key when white has already reached row 8. The keys come from a fixed
+# seed, so the same position hashes the same in every process and every run.
+
+import random
+
+_rng = random.Random(0x43686573735661)
+
+PIECE_KEYS = {piece: tuple(_rng.getrandbits(64) for _ in range(64)) for piece in 'KRBNkrbn'}
+BLACK_TO_MOVE = _rng.getrandbits(64)
+NEAR_WIN = _rng.getrandbits(64)
+
+
+def hash_position(mailbox, turn, near_win):
+    """Computes the hash of a position from scratch given its 64 square mailbox, whose turn it is and whether white
+    has already reached row 8"""
+    key = 0
+    for sq, piece in enumerate(mailbox):
+        if piece != ' ':
+            key ^= PIECE_KEYS[piece][sq]
+    if turn == 'black':
+        key ^= BLACK_TO_MOVE
+    if near_win:
+        key ^= NEAR_WIN
+    return key